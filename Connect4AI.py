@@ -1,78 +1,15 @@
-import numpy as np
 import random
 import pygame
 import sys
 import math
 
-BLUE = (0,0,255)
-BLACK = (0,0,0)
-RED = (255,0,0)
-YELLOW = (255,255,0)
-
-ROW_COUNT = 6
-COLUMN_COUNT = 7
+from engine.rules import (ROW_COUNT, COLUMN_COUNT, create_board, drop_piece, is_valid_location,
+                          get_next_open_row, print_board, winning_move)
+from renderer import BoardRenderer, RED, YELLOW
 
 PLAYER = 0
 AI = 1
 
-def create_board():
-    board = np.zeros((ROW_COUNT,COLUMN_COUNT))
-    return board
-
-
-def drop_piece(board, row, col, piece):
-    board[row][col] = piece
-
-
-def is_valid_location(board, col):
-    return board[ROW_COUNT-1][col] == 0
-
-
-def get_next_open_row(board, col):
-    for r in range(ROW_COUNT):
-        if board[r][col] == 0:
-            return r
-
-
-def print_board(board):
-    print(np.flip(board, 0))
-
-
-def winning_move(board, piece):
-    # check all horizontal locations for win
-    for c in range(COLUMN_COUNT-3):
-        for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c+1] == piece and board[r][c+2] == piece and board[r][c+3] == piece:
-                return True
-    # Check for vertical locations for win
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT):
-            if board[r][c] == piece and board[r+1][c] == piece and board[r+2][c] == piece and board[r+3][c] == piece:
-             return True
-    # Check for positively sloped diagonals
-    for c in range(COLUMN_COUNT-3):
-        for r in range(ROW_COUNT-3):
-            if board[r][c] == piece and board[r+1][c+1] == piece and board[r+2][c+2] == piece and board[r+3][c+3] == piece:
-                return True
-    # Check for negatively sloped diagonals
-    for c in range(COLUMN_COUNT-3):
-        for r in range(3,ROW_COUNT):
-            if board[r][c] == piece and board[r-1][c+1] == piece and board[r-2][c+2] == piece and board[r-3][c+3] == piece:
-                return True
-
-
-def draw_board(board):
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            pygame.draw.rect(screen, BLUE, (c*SQUARESIZE, r*SQUARESIZE+SQUARESIZE, SQUARESIZE, SQUARESIZE))
-            pygame.draw.circle(screen, BLACK, (int(c*SQUARESIZE+SQUARESIZE/2), int(r*SQUARESIZE+SQUARESIZE+SQUARESIZE/2)), RADIUS)
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            if board[r][c] == 1:
-                pygame.draw.circle(screen, RED, (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
-            elif board[r][c] == 2:
-                pygame.draw.circle(screen, YELLOW,(int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)),RADIUS)
-    pygame.display.update()
 
 board = create_board()
 print_board(board)
@@ -87,9 +24,13 @@ height = (ROW_COUNT+1) * SQUARESIZE
 size = (width,height)
 RADIUS = int(SQUARESIZE/2 - 5)
 
+FPS = 60
+
 screen = pygame.display.set_mode(size)
-draw_board(board)
-pygame.display.update()
+renderer = BoardRenderer(screen, ROW_COUNT, COLUMN_COUNT, SQUARESIZE, RADIUS)
+renderer.draw_board(board, {1: RED, 2: YELLOW})
+renderer.flush()
+clock = pygame.time.Clock()
 
 myfont = pygame.font.SysFont("monospace", 75)
 
@@ -101,13 +42,11 @@ while not game_over:
         if event.type == pygame.QUIT:
             sys.exit()
         if event.type == pygame.MOUSEMOTION:
-            pygame.draw.rect(screen, BLACK, (0,0,width,SQUARESIZE))
             posx = event.pos[0]
             if turn == PLAYER:
-                pygame.draw.circle(screen, RED, (posx, int(SQUARESIZE/2)), RADIUS)
-            # else:
-            #     pygame.draw.circle(screen, YELLOW, (posx, int(SQUARESIZE / 2)), RADIUS)
-        pygame.display.update()
+                renderer.set_hover(posx, RED)
+            else:
+                renderer.set_hover(posx, None)
 
         if event.type == pygame.MOUSEBUTTONDOWN:
             # print(event.pos)
@@ -119,19 +58,18 @@ while not game_over:
                 if is_valid_location(board, col):
                     row = get_next_open_row(board, col)
                     drop_piece(board, row, col, 1)
-                    pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                    renderer.draw_piece(row, col, RED)
+                    renderer.clear_top()
 
                     if winning_move(board, 1):
-                        pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
                         label = myfont.render("Player 1 Wins!!", 1, RED)
-                        screen.blit(label, (40,10))
+                        renderer.blit_top(label, (40,10))
                         game_over = True
 
                     turn += 1
                     turn = turn % 2
 
                     print_board(board)
-                    draw_board(board)
 
 
     # Ask for AI Input
@@ -143,18 +81,21 @@ while not game_over:
             pygame.time.wait(500)
             row = get_next_open_row(board, col)
             drop_piece(board, row, col, 2)
+            renderer.draw_piece(row, col, YELLOW)
 
             if winning_move(board, 2):
-                pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                renderer.clear_top()
                 label = myfont.render("Player 2 Wins!!", 1, YELLOW)
-                screen.blit(label, (40,10))
+                renderer.blit_top(label, (40,10))
                 game_over = True
 
             print_board(board)
-            draw_board(board)
 
             turn += 1
             turn = turn % 2
 
+    renderer.flush()
+    clock.tick(FPS)
+
     if game_over:
             pygame.time.wait(3000)
\ No newline at end of file
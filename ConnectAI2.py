@@ -1,198 +1,49 @@
-import numpy as np
 import random
 import pygame
 import sys
 import math
-
-# https://en.wikipedia.org/wiki/Minimax#Pseudocode
-# https://en.wikipedia.org/wiki/Alpha%E2%80%93beta_pruning
-#
-
-
-BLUE = (0,0,255)
-BLACK = (0,0,0)
-RED = (255,0,0)
-YELLOW = (255,255,0)
-
-ROW_COUNT = 6
-COLUMN_COUNT = 7
+import os
+
+from engine import search
+from engine.background import BackgroundSearch
+from engine.bitboard import BitBoard
+from engine.book import OpeningBook
+from engine.transposition import TranspositionTable
+from engine.ordering import KillerHistoryOrdering
+from engine.parallel import ParallelSearch
+from engine.ponder import Ponder
+from engine.rules import (ROW_COUNT, COLUMN_COUNT, PLAYER_PIECE, AI_PIECE, create_board, drop_piece,
+                          is_valid_location, get_next_open_row, print_board, winning_move)
+from renderer import BoardRenderer, BLACK, RED, YELLOW
+
+# Pygame front end. The board, rules and AI search live in the engine package.
 
 PLAYER = 0
 AI = 1
 
-PLAYER_PIECE = 1
-AI_PIECE = 2
-
-WINDOWLENGTH = 4
-EMPTY = 0
-
-def create_board():
-    board = np.zeros((ROW_COUNT,COLUMN_COUNT))
-    return board
-
-
-def drop_piece(board, row, col, piece):
-    board[row][col] = piece
-
-
-def is_valid_location(board, col):
-    return board[ROW_COUNT-1][col] == 0
-
-
-def get_next_open_row(board, col):
-    for r in range(ROW_COUNT):
-        if board[r][col] == 0:
-            return r
+# Per-move time budget for the AI, difficulty caps the search depth
+MOVE_TIME_MS = 1500
+# The AI's move is never shown sooner than this after the player's, the
+# search runs during the wait rather than after it
+AI_MIN_DISPLAY_MS = 500
+FPS = 60
+# Written by build_book.py, the AI searches every position if it's missing.
+# The book is searched deeper than any level, so only the top level uses it.
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+BOOK_DIFFICULTY = 5
+# Search with the threat analysis in engine/threats.py
+THREATS = True
+# Search the AI's replies to the player's moves while the player thinks,
+# see engine/ponder.py
+PONDER = True
+# Search the AI's moves over a process pool, one root move per worker, see
+# engine/parallel.py. Always to the full difficulty depth, with no time budget
+PARALLEL = False
+# Set CONNECT4_STATS to a file name to append the search statistics of
+# every AI move to it, one JSON object per line
+STATS_FILE = os.environ.get('CONNECT4_STATS')
 
 
-def print_board(board):
-    print(np.flip(board, 0))
-
-
-def winning_move(board, piece):
-    # check all horizontal locations for win
-    for c in range(COLUMN_COUNT-3): #COLUMN_COUNT-3 because working from left to right if there is no piece
-        # at position COLUMN_COUNT-3 then not possible to have winning move -> same logic for rest
-        for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c+1] == piece and board[r][c+2] == piece and board[r][c+3] == piece:
-                return True
-    # Check for vertical locations for win
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT):
-            if board[r][c] == piece and board[r+1][c] == piece and board[r+2][c] == piece and board[r+3][c] == piece:
-             return True
-    # Check for positively sloped diagonals
-    for c in range(COLUMN_COUNT-3):
-        for r in range(ROW_COUNT-3):
-            if board[r][c] == piece and board[r+1][c+1] == piece and board[r+2][c+2] == piece and board[r+3][c+3] == piece:
-                return True
-    # Check for negatively sloped diagonals
-    for c in range(COLUMN_COUNT-3):
-        for r in range(3,ROW_COUNT):
-            if board[r][c] == piece and board[r-1][c+1] == piece and board[r-2][c+2] == piece and board[r-3][c+3] == piece:
-                return True
-
-def evaluate_window(window, piece):
-    score = 0
-    opp_piece = PLAYER_PIECE
-    if piece == PLAYER_PIECE:
-        opp_piece = AI_PIECE
-    if window.count(piece) == 4:
-        score += 4
-    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
-        score += 5
-    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
-        score += 2
-
-    if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
-        score -= 4
-
-    return score
-
-def score_position(board, piece):
-    score = 0
-    # Score Centre
-    centre_array = [int(i) for i in list(board[:, COLUMN_COUNT//2])]
-    centre_count = centre_array.count(piece)
-    score += centre_count * 3
-
-    # Score Horizontal
-    for r in range(ROW_COUNT):
-        row_array = [int(i) for i in list(board[r,:])]
-        for c in range(COLUMN_COUNT-3):
-            window = row_array[c:c+WINDOWLENGTH]
-            score += evaluate_window(window, piece)
-    # Score Vertical
-    for c in range(COLUMN_COUNT):
-        col_array = [int(i) for i in list(board[:,c])]
-        for r in range(ROW_COUNT-3):
-            window = col_array[r:WINDOWLENGTH]
-            score += evaluate_window(window, piece)
-    # Score positive sloped diagonal
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT-3):
-            window = [board[r+i][c+i] for i in range(WINDOWLENGTH)]
-            score += evaluate_window(window, piece)
-    # Score negative sloped diagonal
-    for r in range(ROW_COUNT-3):
-        for c in range(COLUMN_COUNT-3):
-            window = [board[r+3-i][c+i] for i in range(WINDOWLENGTH)]
-            score += evaluate_window(window, piece)
-
-    return score
-
-
-def is_terminal_node(board):
-    return winning_move(board, PLAYER_PIECE) or winning_move(board, AI_PIECE) or len(get_valid_locations(board)) == 0
-
-def minimax(board, depth, alpha, beta, maximizingPlayer):
-    valid_locations = get_valid_locations(board)
-    is_terminal = is_terminal_node(board)
-
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if winning_move(board, AI_PIECE):
-                return (None, 10000000)
-            elif winning_move(board, PLAYER_PIECE):
-                return (None, -10000000)
-            else: # Game is over, no more valid moves
-                return (None, 0)
-        else: #Depth is zero
-            return (None, score_position(board, AI_PIECE))
-    if maximizingPlayer:
-        value = -math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
-            row = get_next_open_row(board,col)
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, AI_PIECE)
-            new_score = minimax(b_copy, depth-1, alpha, beta, False)[1]
-            if new_score > value:
-                value = new_score
-                column = col
-            alpha = max(alpha, value)
-            if alpha >= beta:
-                break
-        return column, value
-    else: #minimising player
-        value = math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
-            row = get_next_open_row(board, col)
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, PLAYER_PIECE)
-            new_score = minimax(b_copy, depth-1, alpha, beta, True)[1]
-            if new_score < value:
-                value = new_score
-                column = col
-            beta = min(beta, value)
-            if alpha >= beta:
-                break
-        return column, value
-
-def get_valid_locations(board):
-    valid_locations = []
-    for col in range(COLUMN_COUNT):
-        if is_valid_location(board,col):
-            valid_locations.append(col)
-    return valid_locations
-
-
-def pick_best_move(board,piece):
-    valid_locations = get_valid_locations(board)
-    best_score = -1000
-    best_col = random.choice(valid_locations)
-    for col in valid_locations:
-        row = get_next_open_row(board, col)
-        temp_board = board.copy()
-        drop_piece(temp_board, row, col, piece)
-        score = score_position(temp_board, piece)
-        if score > best_score:
-            best_score = score
-            best_col = col
-
-    return best_col
-
 class button():
     def __init__(self, color, x, y, width, height, text=''):
         self.color = color
@@ -223,19 +74,6 @@ class button():
 
         return False
 
-def draw_board(board):
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            pygame.draw.rect(screen, BLUE, (c*SQUARESIZE, r*SQUARESIZE+SQUARESIZE, SQUARESIZE, SQUARESIZE))
-            pygame.draw.circle(screen, BLACK, (int(c*SQUARESIZE+SQUARESIZE/2), int(r*SQUARESIZE+SQUARESIZE+SQUARESIZE/2)), RADIUS)
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            if board[r][c] == PLAYER_PIECE:
-                pygame.draw.circle(screen, RED, (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
-            elif board[r][c] == AI_PIECE:
-                pygame.draw.circle(screen, YELLOW,(int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)),RADIUS)
-    pygame.display.update()
-
 def text_objects(msg):
     font = pygame.font.Font(pygame.font.get_default_font(), 36)
     textSurface = font.render(msg, True, YELLOW)
@@ -264,9 +102,15 @@ def draw_main_screen(difficulty):
     screen.blit(textSurf,textRect)
     pygame.display.update()
 
+
 board = create_board()
 print_board(board)
 game_over = False
+# kept for the whole game so each AI turn reuses what the last one searched
+tt = TranspositionTable()
+ordering = KillerHistoryOrdering()
+book = OpeningBook(BOOK_FILE) if os.path.exists(BOOK_FILE) else None
+parallel = ParallelSearch() if PARALLEL else None
 
 pygame.init()
 
@@ -286,18 +130,36 @@ level2button = button((0, 255, 0), (550/4+25), difficultyY, 100, 100, '2')
 level3button = button((0, 255, 0), (550/4*2+25), difficultyY, 100, 100, '3')
 level4button = button((0, 255, 0), (550/4*3+25), difficultyY, 100, 100, '4')
 level5button = button((0, 255, 0), 575, difficultyY, 100, 100, '5')
+menubuttons = [startbutton, level1button, level2button, level3button, level4button, level5button]
+renderer = BoardRenderer(screen, ROW_COUNT, COLUMN_COUNT, SQUARESIZE, RADIUS)
 myfont = pygame.font.SysFont("monospace", 75)
 mainfont = pygame.font.SysFont("monospace", 25)
 # Main Screen Loop
 home = True
 
 turn = random.randint(PLAYER,AI)
+# AI move being searched on a worker thread, when it started, and the
+# move once it's known
+ai_search = None
+ai_started = 0
+ai_move = None
+ai_pondered = False
+ai_stats = None
+# AI replies searched on the player's time, and the one for the move the
+# player made if it was searched to the end
+ponder = None
+pondered = None
+clock = pygame.time.Clock()
 
 while not game_over:
 
+    # only redrawn when a hover colour or the difficulty changes
+    menu_dirty = True
     while home:
-        pygame.display.update()
-        draw_main_screen(difficulty)
+        if menu_dirty:
+            draw_main_screen(difficulty)
+            menu_dirty = False
+        clock.tick(FPS)
 
         for event in pygame.event.get():
             pos = pygame.mouse.get_pos()
@@ -305,70 +167,41 @@ while not game_over:
             if event.type == pygame.QUIT:
                 sys.exit()
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if startbutton.isOver(pos):
-                home = False
-            if level1button.isOver(pos):
-                screen.fill((0,0,0))
-                difficulty = 1
-                draw_main_screen(difficulty)
-            if level2button.isOver(pos):
-                screen.fill((0, 0, 0))
-                difficulty = 2
-                draw_main_screen(difficulty)
-            if level3button.isOver(pos):
-                screen.fill((0, 0, 0))
-                difficulty = 3
-                draw_main_screen(difficulty)
-            if level4button.isOver(pos):
-                screen.fill((0, 0, 0))
-                difficulty = 4
-                draw_main_screen(difficulty)
-            if level5button.isOver(pos):
-                screen.fill((0, 0, 0))
-                difficulty = 5
-                draw_main_screen(difficulty)
-
-        if event.type == pygame.MOUSEMOTION:
-            if startbutton.isOver(pos):
-                startbutton.color = (255, 0, 0)
-            else:
-                startbutton.color = (0, 255, 0)
-            if level1button.isOver(pos):
-                level1button.color = (255, 0, 0)
-            else:
-                level1button.color = (0, 255, 0)
-            if level2button.isOver(pos):
-                level2button.color = (255, 0, 0)
-            else:
-                level2button.color = (0, 255, 0)
-            if level3button.isOver(pos):
-                level3button.color = (255, 0, 0)
-            else:
-                level3button.color = (0, 255, 0)
-            if level4button.isOver(pos):
-                level4button.color = (255, 0, 0)
-            else:
-                level4button.color = (0, 255, 0)
-            if level5button.isOver(pos):
-                level5button.color = (255, 0, 0)
-            else:
-                level5button.color = (0, 255, 0)
-
-    draw_board(board)
-    pygame.display.update()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if startbutton.isOver(pos):
+                    home = False
+                    screen.fill(BLACK)
+                    renderer.draw_board(board, {PLAYER_PIECE: RED, AI_PIECE: YELLOW})
+                for level, levelbutton in enumerate(menubuttons[1:], 1):
+                    if levelbutton.isOver(pos):
+                        screen.fill((0, 0, 0))
+                        difficulty = level
+                        menu_dirty = True
+
+            if event.type == pygame.MOUSEMOTION:
+                for menubutton in menubuttons:
+                    color = (255, 0, 0) if menubutton.isOver(pos) else (0, 255, 0)
+                    if menubutton.color != color:
+                        menubutton.color = color
+                        menu_dirty = True
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if ai_search is not None:
+                ai_search.cancel()
+            if ponder is not None:
+                ponder.stop()
+            if parallel is not None:
+                parallel.close()
             sys.exit()
         if event.type == pygame.MOUSEMOTION:
-            pygame.draw.rect(screen, BLACK, (0,0,width,SQUARESIZE))
             posx = event.pos[0]
             if turn == PLAYER:
-                pygame.draw.circle(screen, RED, (posx, int(SQUARESIZE/2)), RADIUS)
-            # else:
-            #     pygame.draw.circle(screen, YELLOW, (posx, int(SQUARESIZE / 2)), RADIUS)
-        pygame.display.update()
+                renderer.set_hover(posx, RED)
+                if ponder is not None:
+                    ponder.focus(int(math.floor(posx/SQUARESIZE)))
+            else:
+                renderer.set_hover(posx, None)
 
         if event.type == pygame.MOUSEBUTTONDOWN:
             # print(event.pos)
@@ -378,60 +211,90 @@ while not game_over:
                 col = int(math.floor(posx/SQUARESIZE))
 
                 if is_valid_location(board, col):
+                    if ponder is not None:
+                        ponder.stop()
+                        pondered = ponder.result(col)
+                        ponder = None
                     row = get_next_open_row(board, col)
                     drop_piece(board, row, col, PLAYER_PIECE)
-                    pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                    renderer.draw_piece(row, col, RED)
+                    renderer.clear_top()
 
                     if winning_move(board, PLAYER_PIECE):
-                        pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
                         label = myfont.render("Player 1 Wins!!", 1, RED)
-                        screen.blit(label, (40,10))
+                        renderer.blit_top(label, (40,10))
                         game_over = True
 
                     turn += 1
                     turn = turn % 2
 
                     # print_board(board)
-                    draw_board(board)
 
 
+    # Think about the AI's replies while the player chooses a move
+    if PONDER and turn == PLAYER and not game_over and ponder is None:
+        ponder = Ponder(BitBoard.from_array(board), difficulty, tt, True, ordering,
+                        book if difficulty >= BOOK_DIFFICULTY else None, THREATS)
+
     # Ask for AI Input
-    if turn == AI and not game_over:
+    if turn == AI and not game_over and ai_search is None and ai_move is None:
 
         # col = random.randint(0, COLUMN_COUNT-1)#
-        # col = pick_best_move(board, AI_PIECE)
-        col,mimimax_score = minimax(board,difficulty, -math.inf, math.inf, True)
+        # col = search.pick_best_move(BitBoard.from_array(board), AI_PIECE)
+        ai_stats = search.SearchStats() if STATS_FILE else None
+        ai_started = pygame.time.get_ticks()
+        ai_pondered = pondered is not None
+        if ai_pondered:
+            # searched in full while the player was thinking
+            ai_move = pondered
+            pondered = None
+        else:
+            # the table is still warm from pondering
+            ai_search = BackgroundSearch(BitBoard.from_array(board), MOVE_TIME_MS, difficulty, tt, True, ordering,
+                                         ai_stats, book if difficulty >= BOOK_DIFFICULTY else None, THREATS,
+                                         parallel)
+
+    elif ai_search is not None and ai_search.done():
+        ai_move = ai_search.result()
+        ai_search = None
+
+    if ai_move is not None and pygame.time.get_ticks() - ai_started >= AI_MIN_DISPLAY_MS:
+        col,mimimax_score,depth = ai_move
+        ai_move = None
+        print(tt.stats())
+        if ai_stats is not None:
+            with open(STATS_FILE, 'a') as f:
+                ai_stats.write_json(f, ply=int((board != 0).sum()), column=col, value=mimimax_score, depth=depth,
+                                    difficulty=difficulty, pondered=ai_pondered)
 
         if is_valid_location(board, col):
-            pygame.time.wait(500)
             row = get_next_open_row(board, col)
             drop_piece(board, row, col, AI_PIECE)
+            renderer.draw_piece(row, col, YELLOW)
 
             if winning_move(board, AI_PIECE):
-                pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                renderer.clear_top()
                 label = myfont.render("Player 2 Wins!!", 1, YELLOW)
-                screen.blit(label, (40,10))
+                renderer.blit_top(label, (40,10))
                 game_over = True
 
             print_board(board)
-            draw_board(board)
 
             turn += 1
             turn = turn % 2
 
-    while game_over:
+    renderer.flush()
+    clock.tick(FPS)
+
+    if game_over:
         msg = f'Press X to Exit'
-        font = pygame.font.Font(pygame.font.get_default_font(), 36)
-        textSurf = font.render(msg, True, (255,255,255))
-        textRect = textSurf.get_rect()
         textSurf, textRect = text_objects(msg)
         textRect.center = (width / 2), 95
         screen.blit(textSurf, textRect)
-        pygame.display.update()
-
-        game_over = True
-        for event in pygame.event.get():
-            pos = pygame.mouse.get_pos()
+        pygame.display.update(textRect)
 
-            if event.type == pygame.QUIT:
-                sys.exit()
+    while game_over:
+        # nothing changes any more, just wait for the window to close
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            sys.exit()
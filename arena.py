@@ -0,0 +1,210 @@
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.bitboard import BitBoard, PLAYER_PIECE, AI_PIECE
+from engine.encoding import to_moves
+from engine.evaluators import load_evaluator
+from engine.gamelog import GameLogWriter
+from engine.geometry import STANDARD, get_geometry
+from engine.search import SearchStats, minimax, pick_best_move
+
+# Headless AI-vs-AI games, for strength and throughput regression testing.
+#
+#   python arena.py minimax:4 greedy --games 1000 --out games.jsonl
+#
+# An agent is one of
+#   random      a random valid column, like Connect4AI.py
+#   greedy      pick_best_move, the best score_position one ply ahead
+#   minimax:D   minimax to depth D
+#   threats:D   minimax to depth D with the threat analysis (threats=True)
+#   net:D       minimax to depth D scoring leaves with the network in
+#               EVALUATOR_FILE (see train_evaluator.py)
+#
+# The two agents take turns to go first. Each game starts with
+# --opening-plies random moves, so games between deterministic agents
+# differ. Games are spread over a process pool and every finished game is
+# written to --out as one JSON line, and to the binary game log --log if
+# given; the totals are printed at the end, with results from the first
+# agent's point of view.
+#
+# --rows, --cols and --connect play on another board, e.g. 7x8 connect 5
+# (see engine/geometry.py). Move strings have one digit per column, so
+# boards are at most 10 columns wide.
+
+EVALUATOR_FILE = 'evaluator.npz'
+
+# the network, loaded once per worker process
+_evaluator = None
+
+
+def parse_agent(spec):
+    # 'random', 'greedy', 'minimax:D', 'threats:D' or 'net:D' -> (name, depth)
+    name, _, depth = spec.partition(':')
+    if name in ('random', 'greedy') and not depth:
+        return name, 0
+    if name in ('minimax', 'threats', 'net') and depth.isdigit() and int(depth) > 0:
+        return name, int(depth)
+    raise argparse.ArgumentTypeError('unknown agent %r, use random, greedy, minimax:D, threats:D or net:D' % spec)
+
+
+def get_evaluator():
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = load_evaluator(EVALUATOR_FILE)
+    return _evaluator
+
+
+def choose_move(agent, board, piece, rng, stats):
+    name, depth = agent
+    if name == 'random':
+        return rng.choice(board.get_valid_locations())
+    if name == 'greedy':
+        stats.nodes += len(board.get_valid_locations())
+        return pick_best_move(board, piece)
+    # minimax scores for the AI, so the player's side minimises
+    evaluator = get_evaluator() if name == 'net' else None
+    return minimax(board, depth, -math.inf, math.inf, piece == AI_PIECE, stats=stats, threats=name == 'threats',
+                   evaluator=evaluator)[0]
+
+
+def play_game(game, agents, seed, opening_plies, geometry=STANDARD):
+    # One game, agents[game % 2] moving first; returns its JSON record
+    rng = random.Random('%d-%d' % (seed, game))
+    first = game % 2
+    board = BitBoard(geometry)
+    players = [None, None]
+    players[first] = PLAYER_PIECE
+    players[1 - first] = AI_PIECE
+    ms = [0.0, 0.0]
+    times = []
+    moves_made = [0, 0]
+    stats = [SearchStats(), SearchStats()]
+    side = first
+    winner = None
+    while board.counter < geometry.cells:
+        piece = players[side]
+        if board.counter < opening_plies:
+            col = rng.choice(board.get_valid_locations())
+            times.append(0.0)
+        else:
+            start = time.perf_counter()
+            col = choose_move(agents[side], board, piece, rng, stats[side])
+            times.append((time.perf_counter() - start) * 1000)
+            ms[side] += times[-1]
+            moves_made[side] += 1
+        board.play(col, piece)
+        if board.winning_move(piece):
+            winner = side
+            break
+        side = 1 - side
+    return {'game': game, 'first': first,
+            'winner': 'draw' if winner is None else winner,
+            'moves': to_moves(board), 'times': times,
+            'ms': ms, 'moves_made': moves_made,
+            'nodes': [stats[0].nodes, stats[1].nodes]}
+
+
+def _play_games(games, agents, seed, opening_plies, geometry):
+    return [play_game(game, agents, seed, opening_plies, geometry) for game in games]
+
+
+def run(agents, games, workers, seed, opening_plies, out, log=None, geometry=STANDARD):
+    # plays the games, writing each record to out and the game to the
+    # GameLogWriter log; returns the records
+    batch = max(1, min(100, games // (workers * 8)))
+    batches = [range(start, min(start + batch, games)) for start in range(0, games, batch)]
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_play_games, games_, agents, seed, opening_plies, geometry)
+                   for games_ in batches]
+        for future in futures:
+            for record in future.result():
+                records.append(record)
+                if out is not None:
+                    out.write(json.dumps(record) + '\n')
+                if log is not None:
+                    # the first agent to move always has PLAYER_PIECE
+                    winner = record['winner']
+                    if winner == 'draw':
+                        winner = 0
+                    else:
+                        winner = PLAYER_PIECE if winner == record['first'] else AI_PIECE
+                    log.append(record['moves'], record['times'], winner)
+            if out is not None:
+                out.flush()
+    return records
+
+
+def summarise(records, names, elapsed):
+    games = len(records)
+    wins = sum(r['winner'] == 0 for r in records)
+    losses = sum(r['winner'] == 1 for r in records)
+    draws = games - wins - losses
+    print('%d games in %.1f s, %.0f games/s' % (games, elapsed, games / elapsed))
+    print('%s vs %s: win %.1f%%  draw %.1f%%  loss %.1f%%' %
+          (names[0], names[1], 100 * wins / games, 100 * draws / games, 100 * losses / games))
+    for first in (0, 1):
+        played = [r for r in records if r['first'] == first]
+        if played:
+            won = sum(r['winner'] == first for r in played)
+            print('  %s first: %d games, first player won %.1f%%' % (names[first], len(played), 100 * won / len(played)))
+    for side in (0, 1):
+        moves = sum(r['moves_made'][side] for r in records)
+        ms = sum(r['ms'][side] for r in records)
+        nodes = sum(r['nodes'][side] for r in records)
+        print('  %-12s %8.3f ms/move %10.0f nodes/game' % (names[side], ms / moves if moves else 0.0, nodes / games))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play AI-vs-AI games headless')
+    parser.add_argument('agents', nargs=2, type=parse_agent, metavar='AGENT',
+                        help='random, greedy, minimax:D, threats:D or net:D')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-plies', type=int, default=2, help='random moves at the start of every game')
+    parser.add_argument('--out', help='JSONL file for the game records')
+    parser.add_argument('--log', help='binary game log to append the games to (see engine/gamelog.py)')
+    parser.add_argument('--rows', type=int, default=STANDARD.rows)
+    parser.add_argument('--cols', type=int, default=STANDARD.cols)
+    parser.add_argument('--connect', type=int, default=STANDARD.connect, help='stones in a row to win')
+    args = parser.parse_args()
+    try:
+        geometry = get_geometry(args.rows, args.cols, args.connect)
+    except ValueError as e:
+        parser.error(str(e))
+    if geometry.cols > 10:
+        parser.error('at most 10 columns')
+    if any(agent[0] == 'net' for agent in args.agents):
+        try:
+            network = get_evaluator()
+        except OSError as e:
+            parser.error('net agents need %s from train_evaluator.py: %s' % (EVALUATOR_FILE, e))
+        if network.geometry is not geometry:
+            parser.error('%s was trained on a %dx%d connect %d board' %
+                         (EVALUATOR_FILE, network.geometry.rows, network.geometry.cols, network.geometry.connect))
+
+    names = ['%s:%d' % agent if agent[1] else agent[0] for agent in args.agents]
+    start = time.perf_counter()
+    try:
+        log = GameLogWriter(args.log, geometry) if args.log else None
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.out, 'w') if args.out else None
+    try:
+        records = run(args.agents, args.games, args.workers, args.seed, args.opening_plies, out, log, geometry)
+    finally:
+        if out is not None:
+            out.close()
+        if log is not None:
+            log.close()
+    summarise(records, names, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
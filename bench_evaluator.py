@@ -0,0 +1,104 @@
+import argparse
+import math
+import os
+import time
+
+import arena
+from benchmark import POSITIONS
+from engine.encoding import from_moves
+from engine.evaluators import HeuristicEvaluator, load_evaluator
+from engine.search import SearchStats, minimax
+
+# The network evaluator against score_position, for speed and strength.
+#
+#   python bench_evaluator.py --depth 5 --games 200
+#
+# Speed: minimax to --depth on benchmark.py's positions with each
+# evaluator, in leaves scored per second and ms per search:
+#   score_position  the search as the game runs it, no evaluator
+#   heuristic       score_position behind the evaluator interface, checked
+#                   to give the same moves and values
+#   network         the network in arena.EVALUATOR_FILE, batched per node
+#   network 1-by-1  the same network called once per leaf, checked to give
+#                   the batched search's values up to float32 rounding
+#                   (NETWORK_TOLERANCE); near-ties can pick another move
+#
+# Strength: arena games between net:D and minimax:D, which differ only in
+# how their leaves are scored.
+
+# most a search value may differ between the batched and 1-by-1 network,
+# whose scores run to about SCALE = 1000 in float32
+NETWORK_TOLERANCE = 0.01
+
+
+class OneByOne():
+    # an evaluator with its batching taken away
+    batched = False
+
+    def __init__(self, evaluator):
+        self.evaluator = evaluator
+
+    def evaluate(self, board, to_move):
+        return self.evaluator.evaluate(board, to_move)
+
+
+def search(board, depth, evaluator):
+    stats = SearchStats()
+    start = time.perf_counter()
+    result = minimax(board, depth, -math.inf, math.inf, True, stats=stats, evaluator=evaluator)
+    return result, stats.leaves, time.perf_counter() - start
+
+
+def speed(depth, network):
+    evaluators = [('score_position', None), ('heuristic', HeuristicEvaluator()),
+                  ('network', network), ('network 1-by-1', OneByOne(network))]
+    print('%-16s %12s %10s' % ('evaluator', 'leaves/s', 'ms/search'))
+    # the batched network's values, by position
+    batched = {}
+    for name, evaluator in evaluators:
+        leaves = 0
+        elapsed = 0.0
+        searches = 0
+        for phase, positions in POSITIONS.items():
+            for moves in positions:
+                board = from_moves(moves)
+                result, n, seconds = search(board, depth, evaluator)
+                if name == 'heuristic':
+                    expected = search(board, depth, None)[0]
+                    if result != expected:
+                        raise SystemExit('%s: heuristic %r != score_position %r' % (moves, result, expected))
+                elif name == 'network':
+                    batched[moves] = result[1]
+                elif name == 'network 1-by-1' and abs(result[1] - batched[moves]) > NETWORK_TOLERANCE:
+                    raise SystemExit('%s: network 1-by-1 value %r != batched %r' % (moves, result[1], batched[moves]))
+                leaves += n
+                elapsed += seconds
+                searches += 1
+        print('%-16s %12.0f %10.2f' % (name, leaves / elapsed, elapsed * 1000 / searches))
+
+
+def strength(depth, games, workers, opening_plies):
+    names = ['net:%d' % depth, 'minimax:%d' % depth]
+    start = time.perf_counter()
+    records = arena.run([('net', depth), ('minimax', depth)], games, workers, 0, opening_plies, None)
+    arena.summarise(records, names, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the network evaluator with score_position')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--games', type=int, default=200, help='arena games, 0 to skip')
+    parser.add_argument('--arena-depth', type=int, default=4)
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    network = load_evaluator(arena.EVALUATOR_FILE)
+    speed(args.depth, network)
+    if args.games:
+        print()
+        strength(args.arena_depth, args.games, args.workers, args.opening_plies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+
+from engine.bitboard import AI_PIECE
+from engine.encoding import from_moves
+from engine.ordering import StaticOrdering, KillerHistoryOrdering
+from engine.parallel import ParallelSearch
+from engine.search import search_root
+from engine.transposition import TranspositionTable
+
+# Wall-clock speedup of the root-parallel search against the serial one.
+#
+#   python bench_parallel.py --depths 6 7 8 9 --workers 1 2 4 8
+#
+# Every parallel result is checked against the serial (column, value).
+
+# columns played from an empty board, the player first
+POSITIONS = {
+    'opening': [3, 3],
+    'early': [3, 2, 3, 3, 4, 2],
+    'middle': [3, 3, 2, 4, 4, 2, 3, 1, 5, 5, 2, 0],
+}
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='Benchmark root-parallel minimax')
+    parser.add_argument('--depths', type=int, nargs='+', default=[6, 7, 8, 9])
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, cpus}))
+    parser.add_argument('--no-ybw', action='store_true', help='split every root move, no Young Brothers Wait')
+    args = parser.parse_args()
+
+    pools = {workers: ParallelSearch(workers, not args.no_ybw) for workers in args.workers}
+    print('%-8s %5s %10s' % ('position', 'depth', 'serial ms') +
+          ''.join(' %7s' % ('%dw x' % workers) for workers in args.workers))
+    try:
+        for name, moves in POSITIONS.items():
+            board = from_moves(moves)
+            order = StaticOrdering().order(board, board.get_valid_locations(), None, AI_PIECE)
+            for depth in args.depths:
+                start = time.perf_counter()
+                expected = search_root(board, depth, order, True, TranspositionTable(),
+                                       None, KillerHistoryOrdering())
+                serial = time.perf_counter() - start
+                line = '%-8s %5d %10.1f' % (name, depth, serial * 1000)
+                for workers in args.workers:
+                    start = time.perf_counter()
+                    result = pools[workers].search(board, depth, True, order)
+                    elapsed = time.perf_counter() - start
+                    if result != expected:
+                        raise SystemExit('%s depth %d: parallel %r != serial %r' % (name, depth, result, expected))
+                    line += ' %7.2f' % (serial / elapsed)
+                print(line)
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+from engine import evaluate, rules, search
+from engine.bitboard import AI_PIECE
+from engine.encoding import from_moves
+from engine.ordering import KillerHistoryOrdering
+
+# Benchmarks for the engine's hot paths, compared against a stored baseline.
+#
+#   python benchmark.py                  run and compare with bench_baseline.json
+#   python benchmark.py --save           run and make this the new baseline
+#   python benchmark.py --tolerance 10   fail when anything is >10% slower
+#   python benchmark.py --only minimax   only the benchmarks whose name matches
+#
+# Each benchmark runs over a fixed set of early, middle and late positions,
+# all with the AI to move. The win check, evaluator and move generation are
+# timed per call; minimax at depths 1-7 is timed per move, with its node
+# count and nodes/s. Every timing is the best of --repeat runs.
+#
+# allocations/<phase> traces a depth-5 search with move ordering and the
+# threat analysis, as the game runs it, with tracemalloc, for the most
+# memory the search held at once over what it held at the root. That is
+# what every ply down the recursion keeps allocated while it searches its
+# children; minimax keeps its moves and best columns in preallocated
+# per-ply buffers, so a ply holds little more than the integers its bit
+# arithmetic makes, and more than MAX_BYTES_PER_PLY fails. A search that
+# builds a list of moves or returns a tuple at every node holds more than
+# twice that.
+#
+# Timings are compared as multiples of a calibration loop of plain Python
+# arithmetic, timed next to every run of every benchmark, so a machine
+# that is faster or slower overall, or that speeds up and slows down
+# during the run, doesn't move them. Noise only ever adds time, so a
+# benchmark that comes out slower is run again, up to RETRIES times, and
+# only fails if it is slower every time. Node counts are exact, and any
+# difference from the baseline fails at once: the search has changed.
+
+BASELINE_FILE = 'bench_baseline.json'
+TOLERANCE = 20
+# iterations of the calibration loop, a few milliseconds
+CALIBRATION_LOOPS = 20000
+RETRIES = 3
+DEPTHS = range(1, 8)
+ALLOCATION_DEPTH = 5
+# peak traced bytes per ply of ALLOCATION_DEPTH; the buffered search
+# holds 300-500
+MAX_BYTES_PER_PLY = 600
+
+# columns played from an empty board, the player first
+POSITIONS = {
+    'early': ['33220', '3322454', '13636', '05313'],
+    'middle': ['36403334264005046', '3322551034423', '4333401101431', '43361205164202221'],
+    'late': ['0313333115611656510300605', '31313500521313221521636060062',
+             '33143004413311441306401665555', '320233223320013111211445044'],
+}
+
+
+def calibration():
+    # a fixed amount of the kind of work the engine does: integer bit
+    # arithmetic, indexing and calls
+    table = list(range(64))
+    x = 0
+    for i in range(CALIBRATION_LOOPS):
+        x = (x * 31 + table[i & 63]) & 0xFFFFFFFF
+        x ^= abs(x >> 7)
+    return x
+
+
+def best_time(run, repeat):
+    # (fastest run, fastest calibration) in seconds, the calibration timed
+    # just before every run
+    best = math.inf
+    calibrated = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calibration()
+        middle = time.perf_counter()
+        run()
+        end = time.perf_counter()
+        best = min(best, end - middle)
+        calibrated = min(calibrated, middle - start)
+    return best, calibrated
+
+
+def call_benchmarks(boards):
+    # (name, inputs, function of one input), timed per call
+    arrays = [bb.to_array() for bb in boards]
+    return [
+        ('winning_move[bitboard]', boards, lambda bb: bb.winning_move(AI_PIECE)),
+        ('winning_move[array]', arrays, lambda b: rules.winning_move(b, AI_PIECE)),
+        ('score_position[bitboard]', boards, lambda bb: bb.score_position(AI_PIECE)),
+        ('score_position[array]', arrays, lambda b: evaluate.score_position(b, AI_PIECE)),
+        ('get_valid_locations[bitboard]', boards, lambda bb: bb.get_valid_locations()),
+        ('get_valid_locations[array]', arrays, rules.get_valid_locations),
+        ('is_terminal_node[bitboard]', boards, lambda bb: bb.is_terminal_node()),
+        ('is_terminal_node[array]', arrays, rules.is_terminal_node),
+    ]
+
+
+def allocation_benchmark(boards):
+    # a warm-up search first, so the history scores and counters it grows
+    # are already allocated and the peak is the search's own
+    ordering = KillerHistoryOrdering()
+    buffers = search.SearchBuffers(boards[0].geometry)
+    stats = search.SearchStats()
+
+    def run():
+        for bb in boards:
+            search.minimax(bb, ALLOCATION_DEPTH, -math.inf, math.inf, True, None, None, ordering, stats, True, buffers)
+
+    tracemalloc.start()
+    try:
+        run()
+        stats.nodes = 0
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': peak, 'bytes_per_ply': peak / ALLOCATION_DEPTH, 'nodes': stats.nodes}
+
+
+def run_benchmarks(repeat, only, calls, names=None):
+    # only the benchmarks in names, if given
+    def skip(name):
+        return (only and only not in name) or (names is not None and name not in names)
+
+    results = {}
+    for phase, positions in POSITIONS.items():
+        boards = [from_moves(moves) for moves in positions]
+        for name, items, fn in call_benchmarks(boards):
+            name = '%s/%s' % (name, phase)
+            if skip(name):
+                continue
+
+            def run():
+                for _ in range(calls):
+                    for item in items:
+                        fn(item)
+            elapsed, calibrated = best_time(run, repeat)
+            per_call = elapsed / (calls * len(items))
+            results[name] = {'us_per_call': per_call * 1e6, 'relative': per_call / calibrated}
+            report(name, results[name])
+
+        for depth in DEPTHS:
+            name = 'minimax/%s/depth%d' % (phase, depth)
+            if skip(name):
+                continue
+            stats = search.SearchStats()
+
+            def run():
+                stats.nodes = 0
+                for bb in boards:
+                    search.minimax(bb, depth, -math.inf, math.inf, True, stats=stats)
+            elapsed, calibrated = best_time(run, repeat)
+            results[name] = {'ms_per_move': elapsed / len(boards) * 1e3,
+                             'relative': elapsed / len(boards) / calibrated,
+                             'nodes': stats.nodes,
+                             'nodes_per_second': stats.nodes / elapsed}
+            report(name, results[name])
+
+        name = 'allocations/%s' % phase
+        if not skip(name):
+            results[name] = allocation_benchmark(boards)
+            report(name, results[name])
+    return results
+
+
+def report(name, result):
+    if 'us_per_call' in result:
+        print('%-42s %10.2f us/call' % (name, result['us_per_call']))
+    elif 'peak_bytes' in result:
+        print('%-42s %10.0f bytes/ply %6d peak bytes %6d nodes' %
+              (name, result['bytes_per_ply'], result['peak_bytes'], result['nodes']))
+    else:
+        print('%-42s %10.2f ms/move %9d nodes %9.0f nodes/s' %
+              (name, result['ms_per_move'], result['nodes'], result['nodes_per_second']))
+
+
+def compare(results, baseline, tolerance):
+    # ({name: why} of the benchmarks that fail whatever the timing noise,
+    #  {name: why} of those more than tolerance percent slower than baseline)
+    failed = {}
+    slower = {}
+    for name, result in results.items():
+        if 'bytes_per_ply' in result and result['bytes_per_ply'] > MAX_BYTES_PER_PLY:
+            failed[name] = 'holds %.0f bytes per ply' % result['bytes_per_ply']
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if 'peak_bytes' in result:
+            change = (result['peak_bytes'] / old['peak_bytes'] - 1) * 100
+            if change > tolerance:
+                failed[name] = '%+.0f%% more memory than baseline' % change
+            continue
+        if 'nodes' in result and result['nodes'] != old['nodes']:
+            failed[name] = 'searched %d nodes, baseline %d' % (result['nodes'], old['nodes'])
+            continue
+        change = (result['relative'] / old['relative'] - 1) * 100
+        if change > tolerance:
+            slower[name] = '%+.0f%% slower than baseline' % change
+    return failed, slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the engine against a stored baseline')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='percent slower that counts as a failure')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the fastest is kept')
+    parser.add_argument('--calls', type=int, default=2000, help='calls per position for the per-call benchmarks')
+    parser.add_argument('--only', help='only run benchmarks whose name contains this')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.only, args.calls)
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+    if args.save:
+        # with --only, the other benchmarks keep their old baseline
+        baseline = baseline or {}
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+            f.write('\n')
+        print('saved %s' % args.baseline)
+        return
+    if baseline is None:
+        print('no baseline at %s, run with --save to make one' % args.baseline)
+        return
+    failed, slower = compare(results, baseline, args.tolerance)
+    for _ in range(RETRIES):
+        if not slower:
+            break
+        print('running %d slower benchmarks again' % len(slower))
+        again = run_benchmarks(args.repeat, args.only, args.calls, set(slower))
+        for name, result in again.items():
+            if result['relative'] < results[name]['relative']:
+                results[name] = result
+        slower = compare(results, baseline, args.tolerance)[1]
+    failed.update(slower)
+    for name in sorted(failed):
+        print('%-42s %s' % (name, failed[name]))
+    if failed:
+        print('%d benchmarks more than %g%% slower, searching different nodes or holding too much memory' %
+              (len(failed), args.tolerance))
+        sys.exit(1)
+    print('no benchmark more than %g%% slower than %s' % (args.tolerance, args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import math
+import time
+
+from engine.bitboard import BitBoard, PLAYER_PIECE, AI_PIECE, COLUMN_COUNT
+from engine.book import canonical_key, write_book
+from engine.ordering import KillerHistoryOrdering
+from engine.search import iterative_deepening
+from engine.transposition import TranspositionTable
+
+# Builds the opening book the AI reads before searching (see engine/book.py).
+#
+#   python build_book.py --plies 4 --depth 8 --out opening_book.bin
+#
+# Every position reachable within --plies moves with the AI to move, for
+# either side starting, is searched to --depth. Mirror images are stored
+# once.
+
+
+def collect_positions(plies):
+    # canonical key -> (board, mirrored) for each position the AI is to move in
+    found = {}
+    visited = set()
+    for first in (PLAYER_PIECE, AI_PIECE):
+        _walk(BitBoard(), first, plies, found, visited)
+    return found
+
+
+def _walk(board, piece, plies, found, visited):
+    key, mirrored = canonical_key(board)
+    if (key, piece) in visited:
+        return
+    visited.add((key, piece))
+    if piece == AI_PIECE:
+        found[key] = (board.copy(), mirrored)
+    if board.counter == plies:
+        return
+    for col in board.get_valid_locations():
+        board.play(col, piece)
+        if not board.winning_move(piece):
+            _walk(board, PLAYER_PIECE + AI_PIECE - piece, plies, found, visited)
+        board.undo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening book')
+    parser.add_argument('--plies', type=int, default=4, help='deepest position in the book, in moves from empty')
+    parser.add_argument('--depth', type=int, default=8, help='search depth for every position')
+    parser.add_argument('--out', default='opening_book.bin')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    positions = collect_positions(args.plies)
+    print('%d positions up to %d plies' % (len(positions), args.plies))
+    tt = TranspositionTable(1 << 20)
+    ordering = KillerHistoryOrdering()
+    entries = {}
+    for i, key in enumerate(sorted(positions)):
+        board, mirrored = positions[key]
+        column, value, depth = iterative_deepening(board, math.inf, args.depth, tt, True, ordering)
+        if mirrored:
+            column = COLUMN_COUNT - 1 - column
+        entries[key] = (value, column)
+        if (i + 1) % 100 == 0:
+            print('%d/%d  %.0f s' % (i + 1, len(positions), time.perf_counter() - start))
+    write_book(args.out, entries, args.plies, args.depth)
+    print('wrote %s: %d entries in %.0f s' % (args.out, len(entries), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
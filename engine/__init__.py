@@ -0,0 +1,68 @@
+# Connect 4 engine: board, rules, evaluation and search, with no pygame.
+#
+# Names are imported from their submodule on first use, so `import engine`
+# costs next to nothing and numpy is only loaded by the parts that need it
+# (the NumPy board in rules.py, the vectorised evaluator and the network).
+
+import importlib
+
+_EXPORTS = {
+    'ROW_COUNT': 'rules',
+    'COLUMN_COUNT': 'rules',
+    'PLAYER_PIECE': 'rules',
+    'AI_PIECE': 'rules',
+    'WINDOWLENGTH': 'rules',
+    'EMPTY': 'rules',
+    'create_board': 'rules',
+    'drop_piece': 'rules',
+    'is_valid_location': 'rules',
+    'get_next_open_row': 'rules',
+    'print_board': 'rules',
+    'winning_move': 'rules',
+    'get_valid_locations': 'rules',
+    'is_terminal_node': 'rules',
+    'Geometry': 'geometry',
+    'get_geometry': 'geometry',
+    'STANDARD': 'geometry',
+    'BitBoard': 'bitboard',
+    'evaluate_window': 'bitboard',
+    'score_position': 'evaluate',
+    'score_boards': 'evaluate',
+    'score_children': 'evaluate',
+    'HeuristicEvaluator': 'evaluators',
+    'load_evaluator': 'evaluators',
+    'NetworkEvaluator': 'network',
+    'TranspositionTable': 'transposition',
+    'StaticOrdering': 'ordering',
+    'KillerHistoryOrdering': 'ordering',
+    'WIN_SCORE': 'search',
+    'SearchStats': 'search',
+    'SearchTimeout': 'search',
+    'Deadline': 'search',
+    'minimax': 'search',
+    'search_root': 'search',
+    'iterative_deepening': 'search',
+    'pick_best_move': 'search',
+    'ParallelSearch': 'parallel',
+    'BackgroundSearch': 'background',
+    'Ponder': 'ponder',
+    'OpeningBook': 'book',
+    'Solver': 'solver',
+    'GameLog': 'gamelog',
+    'GameLogWriter': 'gamelog',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,65 @@
+import threading
+
+from .search import Deadline, iterative_deepening
+
+# Runs iterative_deepening on a worker thread, so a game loop can keep
+# handling events while the AI thinks and collect the move when it's ready:
+#
+#   job = BackgroundSearch(board, 1500, difficulty, tt)
+#   ...every frame...
+#   if job.done():
+#       col, value, depth = job.result()
+#
+# The board is searched in place, so hand over a board the caller won't
+# touch until the job is done. cancel() stops the search at its next node.
+#
+# Given a ParallelSearch as parallel, the job instead searches straight to
+# max_depth over its process pool, with no time budget and without tt,
+# ordering or stats, which the workers don't share; cancel() then has no
+# effect.
+
+
+class BackgroundSearch():
+    def __init__(self, board, time_budget_ms, max_depth=None, tt=None, maximizingPlayer=True, ordering=None,
+                 stats=None, book=None, threats=False, parallel=None):
+        self.deadline = Deadline(time_budget_ms)
+        self.parallel = parallel
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        args=(board, time_budget_ms, max_depth, tt, maximizingPlayer,
+                                              ordering, stats, book, threats))
+        self._thread.start()
+
+    def _run(self, board, time_budget_ms, max_depth, tt, maximizingPlayer, ordering, stats, book, threats):
+        try:
+            if self.parallel is not None:
+                self._result = self._parallel(board, max_depth, maximizingPlayer, book, threats)
+                return
+            self._result = iterative_deepening(board, time_budget_ms, max_depth, tt, maximizingPlayer, ordering,
+                                               stats, self.deadline, book, threats)
+        except BaseException as e:
+            self._error = e
+
+    def _parallel(self, board, max_depth, maximizingPlayer, book, threats):
+        if book is not None and maximizingPlayer:
+            entry = book.lookup(board)
+            if entry is not None:
+                return entry[0], entry[1], book.depth
+        cells = board.geometry.cells
+        depth = min(max_depth or cells, cells - board.counter)
+        column, value = self.parallel.search(board, depth, maximizingPlayer, None, threats)
+        return column, value, depth
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def cancel(self):
+        self.deadline.cancel()
+
+    def result(self):
+        # (column, value, depth), waiting for the search if it's still running
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,221 @@
+# Bitboard game engine.
+#
+# A position is stored as one integer per player plus a height table.
+# Bits are laid out column by column, bottom to top, with one spare
+# sentinel bit on top of every column so that shifting never wraps a
+# line from one column into the next:
+#
+#   6 13 20 27 34 41 48   <- sentinel row, always empty
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42
+#
+# Row 0 is the bottom row, matching the NumPy board in rules.py.
+
+from .geometry import STANDARD, get_geometry
+from .rules import ROW_COUNT, COLUMN_COUNT, PLAYER_PIECE, AI_PIECE, WINDOWLENGTH, EMPTY
+
+# The tables and functions below are the standard 6x7 connect-4 board's,
+# see geometry.py; a BitBoard made with another Geometry reads that one's
+# instead.
+
+H1 = STANDARD.h1
+CELL_COUNT = STANDARD.cells
+
+BOTTOM_MASK = STANDARD.bottom_mask
+BOARD_MASK = STANDARD.board_mask
+
+# the same stones reflected left to right
+mirror_bits = STANDARD.mirror_bits
+# four in a row anywhere in bits
+has_four = STANDARD.has_won
+
+
+# Every window score_position looks at, as (row, col) cells, in the same
+# order it visits them.
+WINDOWS = STANDARD.windows
+
+# XORed into the Zobrist hash by the search when the minimising player is
+# to move
+ZOBRIST_SIDE = STANDARD.zobrist_side
+
+
+def evaluate_window(window, piece):
+    score = 0
+    opp_piece = PLAYER_PIECE
+    if piece == PLAYER_PIECE:
+        opp_piece = AI_PIECE
+    if window.count(piece) == 4:
+        score += 4
+    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
+        score += 5
+    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
+        score += 2
+
+    if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
+        score -= 4
+
+    return score
+
+
+# WINDOW_SCORES[own][opp] -> evaluate_window of a window holding own of the
+# scored piece and opp of the other, so a window is scored from two popcounts
+WINDOW_SCORES = tuple(tuple(evaluate_window([AI_PIECE] * own + [PLAYER_PIECE] * opp
+                                            + [EMPTY] * (WINDOWLENGTH - own - opp), AI_PIECE)
+                            if own + opp <= WINDOWLENGTH else 0
+                            for opp in range(WINDOWLENGTH + 1))
+                      for own in range(WINDOWLENGTH + 1))
+
+
+class BitBoard():
+    __slots__ = ('bits', 'heights', 'moves', 'counter', 'hash', 'mirror_hash', 'geometry')
+
+    def __init__(self, geometry=STANDARD):
+        # the board's size and line length, and the tables that go with them
+        self.geometry = geometry
+        # bits[piece] holds the stones of PLAYER_PIECE / AI_PIECE, bits[EMPTY] is unused
+        self.bits = [0, 0, 0]
+        # index of the next free bit in every column
+        self.heights = [c * geometry.h1 for c in range(geometry.cols)]
+        # columns played so far, so unmake needs no arguments
+        self.moves = [0] * geometry.cells
+        self.counter = 0
+        # Zobrist hash: the XOR of the geometry's random key for every stone
+        # on the board, kept up to date in play/undo
+        self.hash = 0
+        # hash of the mirror image, kept alongside so a position and its
+        # reflection can share cache entries (see search.py)
+        self.mirror_hash = 0
+
+    @classmethod
+    def from_array(cls, board, connect=WINDOWLENGTH):
+        # the board's size is taken from the array
+        rows, cols = len(board), len(board[0])
+        bb = cls(get_geometry(rows, cols, connect))
+        for c in range(cols):
+            for r in range(rows):
+                piece = int(board[r][c])
+                if piece == EMPTY:
+                    break
+                bb.play(c, piece)
+        return bb
+
+    def to_array(self):
+        import numpy as np
+        g = self.geometry
+        board = np.zeros((g.rows, g.cols))
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            bits = self.bits[piece]
+            for c in range(g.cols):
+                for r in range(g.rows):
+                    if bits >> g.cell_index(r, c) & 1:
+                        board[r][c] = piece
+        return board
+
+    def copy(self):
+        bb = BitBoard(self.geometry)
+        bb.bits = self.bits[:]
+        bb.heights = self.heights[:]
+        bb.moves = self.moves[:]
+        bb.counter = self.counter
+        bb.hash = self.hash
+        bb.mirror_hash = self.mirror_hash
+        return bb
+
+    @property
+    def mask(self):
+        return self.bits[PLAYER_PIECE] | self.bits[AI_PIECE]
+
+    def key(self):
+        # Exact key (49 bits on the standard board): the AI's stones plus
+        # every stone plus one bit on the bottom row. Adding the bottom row
+        # moves each column's run of stones up into the empty cell above
+        # it, so the key is unique.
+        return self.bits[AI_PIECE] + self.mask + self.geometry.bottom_mask
+
+    def mirrored_key(self):
+        g = self.geometry
+        return g.mirror_bits(self.bits[AI_PIECE]) + g.mirror_bits(self.mask) + g.bottom_mask
+
+    def is_symmetric(self):
+        return self.hash == self.mirror_hash
+
+    def play(self, col, piece):
+        h = self.heights[col]
+        self.bits[piece] |= 1 << h
+        self.heights[col] = h + 1
+        self.moves[self.counter] = col
+        self.counter += 1
+        zobrist = self.geometry.zobrist[piece]
+        self.hash ^= zobrist[h]
+        self.mirror_hash ^= zobrist[self.geometry.mirror_cell[h]]
+
+    def undo(self):
+        self.counter -= 1
+        col = self.moves[self.counter]
+        h = self.heights[col] - 1
+        self.heights[col] = h
+        bit = 1 << h
+        bits = self.bits
+        piece = PLAYER_PIECE if bits[PLAYER_PIECE] & bit else AI_PIECE
+        bits[piece] ^= bit
+        zobrist = self.geometry.zobrist[piece]
+        self.hash ^= zobrist[h]
+        self.mirror_hash ^= zobrist[self.geometry.mirror_cell[h]]
+        return col
+
+    # Same calls as the NumPy board functions in rules.py
+
+    def drop_piece(self, row, col, piece):
+        # row is implied by the column height, it is only accepted for symmetry
+        self.play(col, piece)
+
+    def is_valid_location(self, col):
+        g = self.geometry
+        return self.heights[col] < col * g.h1 + g.rows
+
+    def get_next_open_row(self, col):
+        return self.heights[col] - col * self.geometry.h1
+
+    def get_valid_locations(self):
+        heights = self.heights
+        g = self.geometry
+        h1 = g.h1
+        rows = g.rows
+        return [col for col in range(g.cols) if heights[col] < col * h1 + rows]
+
+    def fill_valid_locations(self, moves):
+        # get_valid_locations written into the list moves, returns how many;
+        # the search passes a buffer it keeps instead of taking a new list
+        heights = self.heights
+        tops = self.geometry.tops
+        n = 0
+        for col in range(self.geometry.cols):
+            if heights[col] < tops[col]:
+                moves[n] = col
+                n += 1
+        return n
+
+    def winning_move(self, piece):
+        return self.geometry.has_won(self.bits[piece])
+
+    def is_terminal_node(self):
+        has_won = self.geometry.has_won
+        return (has_won(self.bits[PLAYER_PIECE]) or has_won(self.bits[AI_PIECE])
+                or self.counter == self.geometry.cells)
+
+    def score_position(self, piece):
+        g = self.geometry
+        own = self.bits[piece]
+        opp = self.bits[PLAYER_PIECE + AI_PIECE - piece]
+        scores = g.window_scores
+        score = (own & g.centre_mask).bit_count() * 3
+        for mask in g.window_masks:
+            score += scores[(own & mask).bit_count()][(opp & mask).bit_count()]
+        return score
+
+    def print_board(self):
+        print(self.to_array()[::-1])
@@ -0,0 +1,83 @@
+import mmap
+import struct
+
+from .geometry import STANDARD
+from .rules import COLUMN_COUNT
+
+# Opening book: best AI moves for every early position, read from a file.
+#
+# The file is written offline by build_book.py and memory-mapped here, so
+# opening it costs no time and every process using the same book shares
+# the same pages. Records are sorted by position key and found by binary
+# search.
+#
+# Positions are stored once per mirror pair, under the smaller of
+# BitBoard.key() and BitBoard.mirrored_key(), with the move as it is played
+# in that orientation. A lookup from the other side flips the column back.
+#
+# Layout, little-endian:
+#   header: magic b'C4BK', version u16, plies u8, depth u8, count u32
+#   count records: key u64, value i32, column u8, 3 bytes padding
+
+MAGIC = b'C4BK'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBI')
+RECORD = struct.Struct('<Qib3x')
+
+
+def canonical_key(board):
+    # (key, mirrored): mirrored is True when the stored form is the reflection
+    key = board.key()
+    mirrored_key = board.mirrored_key()
+    if mirrored_key < key:
+        return mirrored_key, True
+    return key, False
+
+
+def write_book(path, entries, plies, depth):
+    # entries maps canonical key -> (value, column)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, plies, depth, len(entries)))
+        for key in sorted(entries):
+            value, column = entries[key]
+            f.write(RECORD.pack(key, value, column))
+
+
+class OpeningBook():
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.depth, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError('%s is not a version %d opening book' % (path, VERSION))
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+
+    def lookup(self, board):
+        # (column, value) for the AI to move on board, or None; the book
+        # only holds standard board positions
+        if board.counter > self.plies or board.geometry is not STANDARD:
+            return None
+        key, mirrored = canonical_key(board)
+        lo = 0
+        hi = self.count
+        data = self.data
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            mid_key = struct.unpack_from('<Q', data, offset)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                _, value, column = RECORD.unpack_from(data, offset)
+                if mirrored:
+                    column = COLUMN_COUNT - 1 - column
+                return column, value
+        return None
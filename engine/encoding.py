@@ -0,0 +1,80 @@
+from .bitboard import BitBoard, PLAYER_PIECE, AI_PIECE
+from .geometry import STANDARD
+
+# Compact position encodings.
+#
+#   encode(board) -> int    the 49-bit BitBoard.key(), fits in a u64
+#   decode(key) -> BitBoard
+#   to_moves(board) -> str  the columns played, e.g. '3342'
+#   from_moves(moves) -> BitBoard
+#
+# A key identifies the stones on the board exactly: in every 7-bit column
+# the highest set bit sits just above the stones, and the bits below it
+# are the AI's stones. The side to move follows from the stone count,
+# since the player moves first. A key doesn't remember the order the
+# stones were played in, so a decoded board's move stack lists them
+# column by column; undo still takes stones off correctly.
+#
+# Move strings keep the order and are what the scripts read and write:
+# one digit per move, the player first.
+#
+# Boards of another Geometry are decoded and replayed by passing it; their
+# keys are cols * (rows + 1) bits, so only boards up to 64 cells fit a u64.
+
+def encode(board):
+    return board.key()
+
+
+def decode(key, geometry=STANDARD):
+    if key < 0 or key >> geometry.size:
+        raise ValueError('%r is not a position key' % key)
+    bb = BitBoard(geometry)
+    h1 = geometry.h1
+    zobrist = geometry.zobrist
+    mirror_cell = geometry.mirror_cell
+    bits = bb.bits
+    moves = bb.moves
+    counter = 0
+    hash_ = 0
+    mirror_hash = 0
+    for c in range(geometry.cols):
+        column = (key >> (c * h1)) & geometry.column_mask
+        height = column.bit_length() - 1
+        if height < 0:
+            raise ValueError('%r is not a position key' % key)
+        ai = column - (1 << height)
+        base = c * h1
+        for r in range(height):
+            piece = AI_PIECE if ai >> r & 1 else PLAYER_PIECE
+            bits[piece] |= 1 << (base + r)
+            hash_ ^= zobrist[piece][base + r]
+            mirror_hash ^= zobrist[piece][mirror_cell[base + r]]
+            moves[counter] = c
+            counter += 1
+        bb.heights[c] = base + height
+    bb.counter = counter
+    bb.hash = hash_
+    bb.mirror_hash = mirror_hash
+    return bb
+
+
+def to_moves(board):
+    return ''.join(str(col) for col in board.moves[:board.counter])
+
+
+def from_moves(moves, first=PLAYER_PIECE, geometry=STANDARD):
+    # moves is a string of column digits or a sequence of ints; ValueError
+    # for a move off the board, into a full column or after a win
+    bb = BitBoard(geometry)
+    piece = first
+    won = False
+    for col in moves:
+        if won:
+            raise ValueError('move %r after the game was won' % col)
+        col = int(col)
+        if not 0 <= col < geometry.cols or not bb.is_valid_location(col):
+            raise ValueError('illegal move %r' % col)
+        bb.play(col, piece)
+        won = bb.winning_move(piece)
+        piece = PLAYER_PIECE + AI_PIECE - piece
+    return bb
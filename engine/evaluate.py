@@ -0,0 +1,84 @@
+import numpy as np
+
+from .rules import ROW_COUNT, COLUMN_COUNT, PLAYER_PIECE, AI_PIECE
+from .bitboard import WINDOWS, WINDOW_SCORES
+
+# score_position for the NumPy board, vectorised.
+#
+# The windows are turned into a table of flat cell indices once, so a whole
+# board, or a stack of boards, is scored with one gather and a lookup into
+# the (own, opp) -> score table instead of building a list per window.
+#
+# score_children scores every position one drop away in a single call. It
+# starts from the parent's score and only re-scores the windows that pass
+# through each newly filled cell.
+#
+# Both score exactly as evaluate_window summed over every window, plus 3
+# for each piece in the centre column, which regression.py checks against
+# the positions in golden_positions.txt.
+
+CELL_COUNT = ROW_COUNT * COLUMN_COUNT
+
+# (windows, 4) indices into board.ravel()
+WINDOW_INDEX = np.array([[r * COLUMN_COUNT + c for r, c in w] for w in WINDOWS], dtype=np.intp)
+WINDOW_COUNT = len(WINDOW_INDEX)
+
+SCORE_TABLE = np.array(WINDOW_SCORES, dtype=np.int64)
+
+CENTRE_INDEX = np.arange(ROW_COUNT) * COLUMN_COUNT + COLUMN_COUNT // 2
+
+# For every cell the windows through it, padded with WINDOW_COUNT which
+# refers to an extra all-empty window at the end of PADDED_WINDOW_INDEX.
+_cell_windows = [[] for _ in range(CELL_COUNT)]
+for w, cells in enumerate(WINDOW_INDEX):
+    for cell in cells:
+        _cell_windows[cell].append(w)
+_widest = max(len(ws) for ws in _cell_windows)
+CELL_WINDOWS = np.full((CELL_COUNT, _widest), WINDOW_COUNT, dtype=np.intp)
+for cell, ws in enumerate(_cell_windows):
+    CELL_WINDOWS[cell, :len(ws)] = ws
+PADDED_WINDOW_INDEX = np.vstack([WINDOW_INDEX, np.full((1, 4), CELL_COUNT, dtype=np.intp)])
+
+
+def score_boards(boards, piece):
+    # boards is one (ROW_COUNT, COLUMN_COUNT) board or a stack of them
+    flat = np.asarray(boards).reshape(-1, CELL_COUNT)
+    cells = flat[:, WINDOW_INDEX]
+    own = np.count_nonzero(cells == piece, axis=2)
+    opp = np.count_nonzero(cells == PLAYER_PIECE + AI_PIECE - piece, axis=2)
+    scores = SCORE_TABLE[own, opp].sum(axis=1)
+    scores += np.count_nonzero(flat[:, CENTRE_INDEX] == piece, axis=1) * 3
+    return scores
+
+
+def score_position(board, piece):
+    return int(score_boards(board, piece)[0])
+
+
+def score_children(board, piece, mover, score=None):
+    # Scores for piece of every board reached by mover dropping into a valid
+    # column. Returns (columns, scores). score is board's own score for
+    # piece, when the caller already has it.
+    if score is None:
+        score = score_position(board, piece)
+    board = np.asarray(board)
+    heights = np.count_nonzero(board, axis=0)
+    cols = np.flatnonzero(heights < ROW_COUNT)
+    cells = heights[cols] * COLUMN_COUNT + cols
+
+    # the windows through each dropped cell, looked up on the parent board
+    flat = np.append(board.ravel(), 0)
+    windows = CELL_WINDOWS[cells]
+    window_cells = flat[PADDED_WINDOW_INDEX[windows]]
+    own = np.count_nonzero(window_cells == piece, axis=2)
+    opp = np.count_nonzero(window_cells == PLAYER_PIECE + AI_PIECE - piece, axis=2)
+    before = SCORE_TABLE[own, opp]
+    if mover == piece:
+        after = SCORE_TABLE[own + 1, opp]
+    else:
+        after = SCORE_TABLE[own, opp + 1]
+    real = windows < WINDOW_COUNT
+    delta = ((after - before) * real).sum(axis=1)
+    if mover == piece:
+        delta += (cols == COLUMN_COUNT // 2) * 3
+    return cols, score + delta
@@ -0,0 +1,41 @@
+from .bitboard import AI_PIECE
+
+# Leaf evaluators for minimax.
+#
+# minimax scores its leaves with board.score_position(AI_PIECE) unless it
+# is given an evaluator, which has
+#   evaluate(board, to_move)        -> score of board with to_move to move,
+#                                      from the AI's side
+#   batched                         -> whether to use evaluate_moves
+#   evaluate_moves(board, cols, k, piece)
+#                                   -> scores of the k boards made by piece
+#                                      dropping into cols[0] ... cols[k-1]
+#
+# With a batched evaluator, a node one ply above the horizon hands all its
+# children that didn't end the game to evaluate_moves in one call, so an
+# evaluator that scores a batch at once (see network.py) pays its per-call
+# overhead once per node rather than once per leaf. minimax then runs
+# alpha-beta over the batch in move order, so it searches as it would
+# scoring the leaves one at a time, given the same scores; only leaves
+# after a cut-off are scored that otherwise wouldn't be, which costs more
+# than it saves for an evaluator as cheap to call as score_position. The
+# network's float32 scores are equal only up to rounding: a batch goes
+# through a matrix product that can round differently from one leaf's,
+# so a near-tie can go the other way and pick a different move.
+#
+# HeuristicEvaluator is score_position behind this interface.
+# load_evaluator(path) reads a network saved by train_evaluator.py.
+
+
+class HeuristicEvaluator():
+    # score_position, the window heuristic, one leaf at a time
+    batched = False
+
+    def evaluate(self, board, to_move):
+        return board.score_position(AI_PIECE)
+
+
+def load_evaluator(path):
+    # a NetworkEvaluator with the weights in path
+    from .network import NetworkEvaluator
+    return NetworkEvaluator.load(path)
@@ -0,0 +1,150 @@
+import mmap
+import os
+import struct
+from array import array
+
+from .bitboard import PLAYER_PIECE
+from .encoding import from_moves
+from .geometry import STANDARD, get_geometry
+
+# Append-only binary log of finished games, with the time spent on every
+# move.
+#
+#   with GameLogWriter('games.c4g') as log:
+#       log.append('3342', [12.5, 80.1, 3.0, 95.2], winner=0)
+#
+#   with GameLog('games.c4g') as log:
+#       for i in range(len(log)):
+#           moves, ms, first, winner = log[i]
+#
+# A reader memory-maps the file, so the moves and times it hands out are
+# memoryviews onto the file's pages: nothing is copied or parsed until
+# it's used, and every process reading the same log shares the pages.
+# The file stays mapped while any of those views is alive, even after
+# close(); copy what you keep (bytes(moves), list(ms)) to let it go.
+#
+# The header records the board the games were played on, and a writer
+# only appends to a log for the same board.
+#
+# Layout, little-endian, every record 4-byte aligned:
+#   header: magic b'C4GL', version u16, rows u8, cols u8, connect u8,
+#           3 bytes padding
+#   records: plies u16, first u8, winner u8,
+#            plies column bytes padded to a multiple of 4,
+#            plies f32 milliseconds
+# first is the piece that moved first, winner the piece that won or 0 for
+# a draw or unfinished game. A record cut short by a crash is ignored.
+
+MAGIC = b'C4GL'
+VERSION = 2
+HEADER = struct.Struct('<4sHBBB3x')
+RECORD = struct.Struct('<HBB')
+
+
+def _padded(plies):
+    return (plies + 3) & ~3
+
+
+def _record_size(plies):
+    return RECORD.size + _padded(plies) + 4 * plies
+
+
+def _read_header(data, path):
+    # (geometry, header size) of a log's first bytes
+    if len(data) >= HEADER.size:
+        magic, version, rows, cols, connect = HEADER.unpack_from(data, 0)
+        if magic == MAGIC and version == VERSION:
+            return get_geometry(rows, cols, connect), HEADER.size
+    raise ValueError('%s is not a version %d game log' % (path, VERSION))
+
+
+class GameLogWriter():
+    def __init__(self, path, geometry=STANDARD):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, 'rb') as f:
+                logged = _read_header(f.read(HEADER.size), path)[0]
+            if logged is not geometry:
+                raise ValueError('%s holds games on a %dx%d connect %d board' %
+                                 (path, logged.rows, logged.cols, logged.connect))
+        self.geometry = geometry
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(HEADER.pack(MAGIC, VERSION, geometry.rows, geometry.cols, geometry.connect))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def append(self, moves, ms, winner, first=PLAYER_PIECE):
+        # moves as a string of column digits or a sequence of ints
+        plies = len(moves)
+        if len(ms) != plies:
+            raise ValueError('need one time per move')
+        columns = bytes(int(col) for col in moves)
+        # one write per record, so a crash can only cut the last one short
+        self.file.write(RECORD.pack(plies, first, winner) + columns + bytes(_padded(plies) - plies) +
+                        array('f', ms).tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+
+class GameLog():
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.geometry, offset = _read_header(self.data, path)
+        except ValueError:
+            self.data.close()
+            raise
+        self.view = memoryview(self.data)
+        # start of every complete record
+        self.offsets = array('Q')
+        end = len(self.data)
+        while offset + RECORD.size <= end:
+            size = _record_size(RECORD.unpack_from(self.data, offset)[0])
+            if offset + size > end:
+                break
+            self.offsets.append(offset)
+            offset += size
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        try:
+            self.data.close()
+        except BufferError:
+            # moves or times from __getitem__ are still alive: the file is
+            # unmapped when the last of them goes
+            pass
+
+    def __getitem__(self, i):
+        # (moves, ms, first, winner): moves a memoryview of column bytes,
+        # ms a memoryview of float milliseconds
+        offset = self.offsets[i]
+        plies, first, winner = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        moves = self.view[start:start + plies]
+        start += _padded(plies)
+        ms = self.view[start:start + 4 * plies].cast('f')
+        return moves, ms, first, winner
+
+    def board(self, i, plies=None):
+        # BitBoard of game i after plies moves, the final position by default
+        moves, _, first, _ = self[i]
+        return from_moves(moves[:plies], first, self.geometry)
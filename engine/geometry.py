@@ -0,0 +1,212 @@
+import random
+
+from .rules import ROW_COUNT, COLUMN_COUNT, WINDOWLENGTH
+
+# Board dimensions and connect-N, with every table the bitboard engine
+# needs for them.
+#
+#   g = Geometry(rows=7, cols=8, connect=5)
+#   board = BitBoard(g)
+#
+# Everything that depends on the size of the board or the length of a
+# winning line is worked out here once: the bit masks, every window of
+# `connect` cells (the lines score_position scores and a win completes),
+# the window score table, the Zobrist keys and the mirror image of every
+# cell. A BitBoard carries its
+# Geometry and the search reads the tables from it, so a bigger board
+# costs no more per node than the standard one, only a few more windows
+# to score.
+#
+# STANDARD is the 6x7 connect-4 board. Its tables are the module
+# constants in bitboard.py, and the parts of the engine that are only
+# built for it (the NumPy board and evaluator, the solver, the opening
+# book) refuse or ignore other geometries.
+#
+# Bits are laid out as described in bitboard.py: column by column, bottom
+# to top, with one empty sentinel bit on top of every column.
+
+ZOBRIST_SEED = 20200704
+
+
+def window_score(own, opp, connect):
+    # evaluate_window for a window of connect cells holding own stones of
+    # the scored piece and opp of the other
+    empty = connect - own - opp
+    score = 0
+    if own == connect:
+        score += 4
+    elif own == connect - 1 and empty == 1:
+        score += 5
+    elif own == connect - 2 and empty == 2:
+        score += 2
+    if opp == connect - 1 and empty == 1:
+        score -= 4
+    return score
+
+
+class Geometry():
+    def __init__(self, rows=ROW_COUNT, cols=COLUMN_COUNT, connect=WINDOWLENGTH):
+        if rows < 1 or cols < 1 or connect < 2 or connect > max(rows, cols):
+            raise ValueError('no %d in a row on a %dx%d board' % (connect, rows, cols))
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.h1 = h1 = rows + 1
+        self.cells = rows * cols
+        self.size = cols * h1  # bits in a bitboard, sentinels included
+
+        self.bottom_mask = sum(1 << (c * h1) for c in range(cols))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        self.column_mask = (1 << h1) - 1
+        # the playable cells of each column
+        self.column_masks = tuple(((1 << rows) - 1) << (c * h1) for c in range(cols))
+        self.centre_mask = self.column_masks[cols // 2]
+        self.centre_order = tuple(sorted(range(cols), key=lambda c: abs(c - cols // 2)))
+        # each column's place in centre_order
+        self.centre_rank = tuple(self.centre_order.index(c) for c in range(cols))
+        # the sentinel bit of every column, where its height stops
+        self.tops = tuple(c * h1 + rows for c in range(cols))
+        # rows 1, 3, 5... counting from the bottom, the first player's threat rows
+        self.odd_rows = sum(1 << (c * h1 + r) for c in range(cols) for r in range(0, rows, 2))
+        self.even_rows = self.board_mask ^ self.odd_rows
+        # bit shifts to the next cell along each line: vertical, horizontal
+        # and the two diagonals
+        self.directions = (1, h1, h1 - 1, h1 + 1)
+
+        # every window, as (row, col) cells, in score_position's order:
+        # horizontal, vertical, positive then negative diagonals
+        n = connect
+        windows = []
+        for r in range(rows):
+            for c in range(cols - n + 1):
+                windows.append(tuple((r, c + i) for i in range(n)))
+        for c in range(cols):
+            for r in range(rows - n + 1):
+                windows.append(tuple((r + i, c) for i in range(n)))
+        for r in range(rows - n + 1):
+            for c in range(cols - n + 1):
+                windows.append(tuple((r + i, c + i) for i in range(n)))
+        for r in range(rows - n + 1):
+            for c in range(cols - n + 1):
+                windows.append(tuple((r + n - 1 - i, c + i) for i in range(n)))
+        self.windows = tuple(windows)
+        self.window_masks = tuple(sum(1 << self.cell_index(r, c) for r, c in w) for w in windows)
+        # window_scores[own][opp], see window_score
+        self.window_scores = tuple(tuple(window_score(own, opp, n) if own + opp <= n else 0
+                                         for opp in range(n + 1))
+                                   for own in range(n + 1))
+
+        # one random 64-bit key per piece per cell, and one for the side to
+        # move; the standard board's are the keys it has always had
+        rng = random.Random(ZOBRIST_SEED)
+        self.zobrist = tuple(tuple(rng.getrandbits(64) for _ in range(self.size)) for piece in range(3))
+        self.zobrist_side = rng.getrandbits(64)
+        # the cell each cell lands on when the board is reflected left to right
+        self.mirror_cell = tuple((cols - 1 - i // h1) * h1 + i % h1 for i in range(self.size))
+
+        if connect == 4:
+            # written-out versions for the usual line length
+            self.has_won = self._has_four
+            self.winning_cells = self._winning_cells_4
+
+    def __repr__(self):
+        return 'Geometry(%d, %d, %d)' % (self.rows, self.cols, self.connect)
+
+    def __reduce__(self):
+        # pickled as its dimensions, and shared again on the other side
+        return get_geometry, (self.rows, self.cols, self.connect)
+
+    def cell_index(self, row, col):
+        return col * self.h1 + row
+
+    def mirror_bits(self, bits):
+        # the same stones reflected left to right
+        mirrored = 0
+        h1 = self.h1
+        mask = self.column_mask
+        last = self.cols - 1
+        for c in range(self.cols):
+            mirrored |= ((bits >> (c * h1)) & mask) << ((last - c) * h1)
+        return mirrored
+
+    def has_won(self, bits):
+        # connect stones in a line anywhere; runs are found by doubling, so
+        # each direction costs a few shifts however long the line is
+        n = self.connect
+        for d in self.directions:
+            m = bits
+            length = 1
+            while length * 2 <= n:
+                m &= m >> (length * d)
+                length *= 2
+            if length < n:
+                m &= m >> ((n - length) * d)
+            if m:
+                return True
+        return False
+
+    def _has_four(self, bits):
+        for d in self.directions:
+            m = bits & (bits >> d)
+            if m & (m >> 2 * d):
+                return True
+        return False
+
+    def winning_cells(self, position, mask):
+        # empty cells that would complete a line for the stones in position:
+        # below[k] / above[k] are the cells with k stones in a row on either
+        # side along a direction, and a gap with k on one side and
+        # connect - 1 - k on the other wins
+        n = self.connect
+        board = self.board_mask
+        # a column fills from the bottom, so only its top can be the gap
+        cells = position
+        for i in range(2, n):
+            cells &= position << (i - 1)
+        cells = (cells << 1) & board
+        for d in self.directions[1:]:
+            below = [-1]
+            above = [-1]
+            for k in range(1, n):
+                below.append(below[-1] & (position << (k * d)))
+                above.append(above[-1] & (position >> (k * d)))
+            for k in range(n):
+                cells |= below[k] & above[n - 1 - k]
+        return cells & (board ^ mask)
+
+    def _winning_cells_4(self, position, mask):
+        h1 = self.h1
+        # vertical
+        r = (position << 1) & (position << 2) & (position << 3)
+        # horizontal
+        p = (position << h1) & (position << 2 * h1)
+        r |= p & ((position << 3 * h1) | (position >> h1))
+        p = (position >> h1) & (position >> 2 * h1)
+        r |= p & ((position << h1) | (position >> 3 * h1))
+        # negatively sloped diagonal
+        d = h1 - 1
+        p = (position << d) & (position << 2 * d)
+        r |= p & ((position << 3 * d) | (position >> d))
+        p = (position >> d) & (position >> 2 * d)
+        r |= p & ((position << d) | (position >> 3 * d))
+        # positively sloped diagonal
+        d = h1 + 1
+        p = (position << d) & (position << 2 * d)
+        r |= p & ((position << 3 * d) | (position >> d))
+        p = (position >> d) & (position >> 2 * d)
+        r |= p & ((position << d) | (position >> 3 * d))
+        return r & (self.board_mask ^ mask)
+
+
+_geometries = {}
+
+
+def get_geometry(rows=ROW_COUNT, cols=COLUMN_COUNT, connect=WINDOWLENGTH):
+    # one shared Geometry per set of dimensions, the tables take a moment to build
+    key = (rows, cols, connect)
+    if key not in _geometries:
+        _geometries[key] = Geometry(rows, cols, connect)
+    return _geometries[key]
+
+
+STANDARD = get_geometry()
@@ -0,0 +1,123 @@
+import numpy as np
+
+from .bitboard import PLAYER_PIECE, AI_PIECE
+from .geometry import get_geometry
+
+# A small neural network evaluator, run with NumPy on the CPU.
+#
+#   evaluator = NetworkEvaluator.load('evaluator.npz')
+#   minimax(board, 6, -math.inf, math.inf, True, evaluator=evaluator)
+#
+# The input is one feature per cell for the AI's stones, one per cell for
+# the player's, and one that is 1 when the AI is to move. One hidden ReLU
+# layer feeds a tanh output, the expected result of the game from the
+# AI's side between -1 and 1, which is multiplied by SCALE so a leaf
+# scores on about the same scale as score_position.
+#
+# evaluate_moves scores a batch of children in one pass: the children
+# differ from their parent in one cell and the side to move, so the
+# parent's features are built once and copied, and the whole batch goes
+# through both layers as two matrix products.
+#
+# train_evaluator.py trains the weights from self-play games and saves
+# them with save(); the file also records the board the network is for.
+
+SCALE = 1000
+
+
+def feature_count(geometry):
+    return 2 * geometry.cells + 1
+
+
+_cell_bits = {}
+
+
+def cell_bits(geometry):
+    # bit index of every feature cell, bottom to top, column by column
+    if geometry not in _cell_bits:
+        _cell_bits[geometry] = np.array([geometry.cell_index(r, c) for c in range(geometry.cols)
+                                         for r in range(geometry.rows)], dtype=np.intp)
+    return _cell_bits[geometry]
+
+
+def _unpack(bits, nbytes, index):
+    # the cells at index of a bitboard, as 0/1 bytes
+    return np.unpackbits(np.frombuffer(bits.to_bytes(nbytes, 'little'), dtype=np.uint8), bitorder='little')[index]
+
+
+def features(ai_bits, player_bits, ai_to_move, geometry):
+    # the input vector for one position, as uint8
+    nbytes = (geometry.size + 7) // 8
+    bits = cell_bits(geometry)
+    return np.concatenate([_unpack(ai_bits, nbytes, bits), _unpack(player_bits, nbytes, bits),
+                           [ai_to_move]]).astype(np.uint8)
+
+
+def mirror_features(geometry):
+    # column permutation of the features that reflects the board left to right
+    cells = geometry.cells
+    rows = geometry.rows
+    cols = geometry.cols
+    cell = np.array([(cols - 1 - i // rows) * rows + i % rows for i in range(cells)], dtype=np.intp)
+    return np.concatenate([cell, cell + cells, [2 * cells]])
+
+
+def swap_features(geometry):
+    # column permutation of the features that swaps the AI's stones with the
+    # player's; the to-move feature stays where it is and is flipped apart
+    cells = geometry.cells
+    cell = np.arange(cells, dtype=np.intp)
+    return np.concatenate([cell + cells, cell, [2 * cells]])
+
+
+class NetworkEvaluator():
+    batched = True
+
+    def __init__(self, w1, b1, w2, b2, geometry):
+        self.w1 = np.asarray(w1, dtype=np.float32)
+        self.b1 = np.asarray(b1, dtype=np.float32)
+        self.w2 = np.asarray(w2, dtype=np.float32)
+        self.b2 = np.asarray(b2, dtype=np.float32)
+        self.geometry = geometry
+        self.nbytes = (geometry.size + 7) // 8
+        self.bits = cell_bits(geometry)
+        # bit index -> feature index of that cell for the AI's stones
+        self.feature = np.zeros(geometry.size, dtype=np.intp)
+        self.feature[self.bits] = np.arange(geometry.cells)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        rows, cols, connect = (int(n) for n in data['geometry'])
+        return cls(data['w1'], data['b1'], data['w2'], data['b2'], get_geometry(rows, cols, connect))
+
+    def save(self, path):
+        g = self.geometry
+        np.savez(path, w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2,
+                 geometry=np.array([g.rows, g.cols, g.connect]))
+
+    def forward(self, x):
+        # scores of a batch of feature rows
+        hidden = np.maximum(x @ self.w1 + self.b1, 0)
+        return np.tanh(hidden @ self.w2 + self.b2) * SCALE
+
+    def _features(self, board, ai_to_move):
+        cells = self.geometry.cells
+        x = np.empty(2 * cells + 1, dtype=np.float32)
+        x[:cells] = _unpack(board.bits[AI_PIECE], self.nbytes, self.bits)
+        x[cells:-1] = _unpack(board.bits[PLAYER_PIECE], self.nbytes, self.bits)
+        x[-1] = ai_to_move
+        return x
+
+    def evaluate(self, board, to_move):
+        return float(self.forward(self._features(board, to_move == AI_PIECE)[None])[0])
+
+    def evaluate_moves(self, board, cols, k, piece):
+        # the children have the other side to move
+        x = np.repeat(self._features(board, piece == PLAYER_PIECE)[None], k, axis=0)
+        heights = board.heights
+        cells = self.feature[[heights[cols[i]] for i in range(k)]]
+        if piece == PLAYER_PIECE:
+            cells += self.geometry.cells
+        x[np.arange(k), cells] = 1
+        return self.forward(x).tolist()
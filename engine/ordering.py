@@ -0,0 +1,105 @@
+from .geometry import STANDARD
+
+# Move ordering for the alpha-beta search.
+#
+# Alpha-beta cuts the most when the best move is tried first. In Connect 4
+# the centre columns take part in the most lines, so they are tried first;
+# on top of that, moves that caused a cut-off elsewhere in the tree are
+# likely to cause one again.
+#
+# An ordering object has three methods the search calls:
+#   order(board, valid_locations, tt_move, piece) -> columns to try, in order
+#   sort(board, moves, n, tt_move, piece)          -> the same order, put into
+#                                                     moves[:n] in place
+#   cutoff(board, col, piece, depth)              -> col caused a beta cut-off
+#
+# minimax uses sort on its per-ply move buffers (see search.py), so it
+# sorts in place and builds no lists.
+
+# 3, 2, 4, 1, 5, 0, 6 on the standard board, other boards use their
+# Geometry's centre_order
+CENTRE_ORDER = STANDARD.centre_order
+
+
+def _to_front(moves, n, col):
+    # moves col to the front of moves[:n], if it's there, keeping the
+    # order of the others
+    for i in range(n):
+        if moves[i] == col:
+            while i:
+                moves[i] = moves[i - 1]
+                i -= 1
+            moves[0] = col
+            return
+
+
+class StaticOrdering():
+    # Centre-out order, after the transposition table move
+    def order(self, board, valid_locations, tt_move, piece):
+        moves = list(valid_locations)
+        self.sort(board, moves, len(moves), tt_move, piece)
+        return moves
+
+    def sort(self, board, moves, n, tt_move, piece):
+        rank = board.geometry.centre_rank
+        # insertion sort, there are only a handful of columns
+        for i in range(1, n):
+            col = moves[i]
+            j = i
+            while j and rank[moves[j - 1]] > rank[col]:
+                moves[j] = moves[j - 1]
+                j -= 1
+            moves[j] = col
+        if tt_move is not None:
+            _to_front(moves, n, tt_move)
+
+    def cutoff(self, board, col, piece, depth):
+        pass
+
+
+class KillerHistoryOrdering(StaticOrdering):
+    # Transposition table move, then the killer moves for this ply, then the
+    # rest by history score with centre-out order breaking ties.
+    #
+    # Killers are the last two columns that cut off at a ply (plies count
+    # stones on the board, so they carry over between iterations and
+    # turns). The history table adds depth * depth for every cut-off made by
+    # a piece landing on a cell. The tables are sized for the boards of
+    # geometry.
+
+    def __init__(self, geometry=STANDARD):
+        self.killers = [[None, None] for _ in range(geometry.cells + 1)]
+        self.history = [[0] * geometry.size for piece in range(3)]
+
+    def sort(self, board, moves, n, tt_move, piece):
+        heights = board.heights
+        history = self.history[piece]
+        rank = board.geometry.centre_rank
+        for i in range(1, n):
+            col = moves[i]
+            score = history[heights[col]]
+            j = i
+            while j:
+                other = moves[j - 1]
+                other_score = history[heights[other]]
+                if other_score > score or (other_score == score and rank[other] < rank[col]):
+                    break
+                moves[j] = other
+                j -= 1
+            moves[j] = col
+        # the killers then the table move to the front, so they end up
+        # table move, first killer, second killer
+        killers = self.killers[board.counter]
+        if killers[1] is not None:
+            _to_front(moves, n, killers[1])
+        if killers[0] is not None:
+            _to_front(moves, n, killers[0])
+        if tt_move is not None:
+            _to_front(moves, n, tt_move)
+
+    def cutoff(self, board, col, piece, depth):
+        killers = self.killers[board.counter]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[piece][board.heights[col]] += depth * depth
@@ -0,0 +1,94 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import AI_PIECE, PLAYER_PIECE
+from .encoding import encode, decode
+from .ordering import StaticOrdering, KillerHistoryOrdering
+from .search import minimax, search_root, unique_moves
+from .transposition import TranspositionTable
+
+# Root-parallel minimax over a process pool.
+#
+# Every root move (at most 7) is searched as its own task. With Young
+# Brothers Wait, the default, the first move is searched on its own first
+# and the others then start with its value as the bound, so they still get
+# cut-offs; without it every move is searched with the full window.
+#
+# Positions go to the workers as their encoding.encode() key. Each task gets
+# its own transposition table and move ordering, so a result never depends
+# on which worker ran it. threats=True searches with the threat analysis,
+# as the game does (see search.py).
+#
+# The result is the same (column, value) as search_root at the same depth
+# and root order: a later move only replaces an earlier one when it is
+# strictly better, and a move that fails low against the bound can't be.
+
+TASK_TABLE_SIZE = 1 << 16
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _search_move(key, col, depth, alpha, beta, maximizingPlayer, threats):
+    board = decode(key)
+    board.play(col, AI_PIECE if maximizingPlayer else PLAYER_PIECE)
+    return minimax(board, depth-1, alpha, beta, not maximizingPlayer,
+                   TranspositionTable(TASK_TABLE_SIZE), None, KillerHistoryOrdering(), None, threats)[1]
+
+
+class ParallelSearch():
+    def __init__(self, workers=None, young_brothers_wait=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.young_brothers_wait = young_brothers_wait
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # start every worker now rather than on the first move
+        for future in [self.executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def search(self, board, depth, maximizingPlayer=True, order=None, threats=False):
+        # Returns (column, value), like search_root
+        piece = AI_PIECE if maximizingPlayer else PLAYER_PIECE
+        if order is None:
+            order = StaticOrdering().order(board, board.get_valid_locations(), None, piece)
+        order = unique_moves(board, order)
+        if depth <= 1 or len(order) == 1 or board.is_terminal_node():
+            return search_root(board, depth, order, maximizingPlayer, threats=threats)
+
+        key = encode(board)
+        alpha = -math.inf
+        beta = math.inf
+        values = {}
+        rest = order
+        if self.young_brothers_wait:
+            first = order[0]
+            values[first] = self.executor.submit(_search_move, key, first, depth, alpha, beta,
+                                                 maximizingPlayer, threats).result()
+            if maximizingPlayer:
+                alpha = values[first]
+            else:
+                beta = values[first]
+            rest = order[1:]
+        futures = [(col, self.executor.submit(_search_move, key, col, depth, alpha, beta, maximizingPlayer,
+                                              threats))
+                   for col in rest]
+        for col, future in futures:
+            values[col] = future.result()
+
+        column = order[0]
+        value = values[column]
+        for col in order[1:]:
+            if (values[col] > value) if maximizingPlayer else (values[col] < value):
+                value = values[col]
+                column = col
+        return column, value
@@ -0,0 +1,144 @@
+import math
+import threading
+
+from .bitboard import PLAYER_PIECE, AI_PIECE
+from .search import WIN_SCORE, Deadline, SearchTimeout, search_root
+
+# Pondering: searching the AI's replies on the player's time.
+#
+#   ponder = Ponder(board, difficulty, tt, True, ordering)
+#   ...while the player hovers over col...
+#   ponder.focus(col)
+#   ...the player plays col...
+#   ponder.stop()
+#   result = ponder.result(col)   # (column, value, depth) or None
+#
+# board is the position with the player to move. On a worker thread the
+# AI's reply to every move the player can make is deepened one depth at a
+# time, the column the player is hovering over first and the others
+# shallowest first, until each has been searched to max_depth. The
+# results, and the transposition table tt they fill, are shared with the
+# search that runs once the player has moved: a finished reply is the
+# move iterative_deepening would have picked without a time limit, and an
+# unfinished one leaves the table warm, so the search after the move
+# starts where pondering stopped.
+#
+# tt and ordering must not be used by anything else until stop() returns.
+
+
+class _Reply():
+    # one of the player's moves and how far the AI's answer to it has got
+    def __init__(self, board, order, max_depth):
+        self.board = board
+        self.order = order
+        self.max_depth = max_depth
+        self.depth = 0
+        self.result = None
+        self.finished = False
+
+
+class Ponder():
+    def __init__(self, board, max_depth, tt=None, maximizingPlayer=True, ordering=None, book=None, threats=False):
+        # maximizingPlayer is the side that replies, the AI by default
+        self.max_depth = max_depth
+        self.tt = tt
+        self.maximizingPlayer = maximizingPlayer
+        self.ordering = ordering
+        self.book = book
+        self.threats = threats
+        self.deadline = Deadline(math.inf)
+        self.focused = None
+        self._error = None
+        piece = AI_PIECE if maximizingPlayer else PLAYER_PIECE
+        opponent = PLAYER_PIECE + AI_PIECE - piece
+        cells = board.geometry.cells
+        self.replies = {}
+        for col in board.get_valid_locations():
+            reply = board.copy()
+            reply.play(col, opponent)
+            if reply.winning_move(opponent) or reply.counter == cells:
+                # nothing to reply to
+                continue
+            if ordering is not None:
+                order = ordering.order(reply, reply.get_valid_locations(), None, piece)
+            else:
+                order = reply.get_valid_locations()
+            self.replies[col] = _Reply(reply, order, min(max_depth, cells - reply.counter))
+        # centre-out, so the likelier moves go first among equals
+        self._centre = board.geometry.centre_order
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def focus(self, col):
+        # the player looks like playing col, its reply is deepened first
+        self.focused = col
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def stop(self):
+        # stops the worker at its next node and waits for it
+        self.deadline.cancel()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def result(self, col):
+        # (column, value, depth) of the reply to col if it was searched to
+        # max_depth, or None
+        reply = self.replies.get(col)
+        if reply is None or not reply.finished:
+            return None
+        return reply.result
+
+    def depths(self):
+        # col -> depth the reply to it has been searched to
+        return {col: reply.depth for col, reply in self.replies.items()}
+
+    def _next(self):
+        focused = self.replies.get(self.focused)
+        if focused is not None and not focused.finished:
+            return focused
+        best = None
+        for col in self._centre:
+            reply = self.replies.get(col)
+            if reply is not None and not reply.finished and (best is None or reply.depth < best.depth):
+                best = reply
+        return best
+
+    def _run(self):
+        try:
+            reply = self._next()
+            while reply is not None:
+                self._deepen(reply)
+                reply = self._next()
+        except SearchTimeout:
+            pass
+        except BaseException as e:
+            self._error = e
+
+    def _deepen(self, reply):
+        # one more depth of iterative_deepening on reply
+        board = reply.board
+        if reply.depth == 0 and self.book is not None and self.maximizingPlayer:
+            entry = self.book.lookup(board)
+            if entry is not None:
+                reply.result = entry[0], entry[1], self.book.depth
+                reply.depth = self.book.depth
+                reply.finished = True
+                return
+        depth = reply.depth + 1
+        counter = board.counter
+        try:
+            column, value = search_root(board, depth, reply.order, self.maximizingPlayer, self.tt, self.deadline,
+                                        self.ordering, None, self.threats)
+        except SearchTimeout:
+            while board.counter > counter:
+                board.undo()
+            raise
+        # the best move goes first next time
+        reply.order.remove(column)
+        reply.order.insert(0, column)
+        reply.depth = depth
+        reply.result = column, value, depth
+        reply.finished = depth >= reply.max_depth or abs(value) >= WIN_SCORE
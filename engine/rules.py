@@ -0,0 +1,74 @@
+# Board constants and the rules on the NumPy board the games draw from.
+#
+# numpy is only imported by the functions that build or print a board, so
+# the rest of the engine can use these constants without loading it.
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+
+PLAYER_PIECE = 1
+AI_PIECE = 2
+
+WINDOWLENGTH = 4
+EMPTY = 0
+
+
+def create_board():
+    import numpy as np
+    board = np.zeros((ROW_COUNT,COLUMN_COUNT))
+    return board
+
+
+def drop_piece(board, row, col, piece):
+    board[row][col] = piece
+
+
+def is_valid_location(board, col):
+    return board[ROW_COUNT-1][col] == 0
+
+
+def get_next_open_row(board, col):
+    for r in range(ROW_COUNT):
+        if board[r][col] == 0:
+            return r
+
+
+def print_board(board):
+    import numpy as np
+    print(np.flip(board, 0))
+
+
+def winning_move(board, piece):
+    # check all horizontal locations for win
+    for c in range(COLUMN_COUNT-3): #COLUMN_COUNT-3 because working from left to right if there is no piece
+        # at position COLUMN_COUNT-3 then not possible to have winning move -> same logic for rest
+        for r in range(ROW_COUNT):
+            if board[r][c] == piece and board[r][c+1] == piece and board[r][c+2] == piece and board[r][c+3] == piece:
+                return True
+    # Check for vertical locations for win
+    for r in range(ROW_COUNT-3):
+        for c in range(COLUMN_COUNT):
+            if board[r][c] == piece and board[r+1][c] == piece and board[r+2][c] == piece and board[r+3][c] == piece:
+             return True
+    # Check for positively sloped diagonals
+    for c in range(COLUMN_COUNT-3):
+        for r in range(ROW_COUNT-3):
+            if board[r][c] == piece and board[r+1][c+1] == piece and board[r+2][c+2] == piece and board[r+3][c+3] == piece:
+                return True
+    # Check for negatively sloped diagonals
+    for c in range(COLUMN_COUNT-3):
+        for r in range(3,ROW_COUNT):
+            if board[r][c] == piece and board[r-1][c+1] == piece and board[r-2][c+2] == piece and board[r-3][c+3] == piece:
+                return True
+
+
+def get_valid_locations(board):
+    valid_locations = []
+    for col in range(COLUMN_COUNT):
+        if is_valid_location(board,col):
+            valid_locations.append(col)
+    return valid_locations
+
+
+def is_terminal_node(board):
+    return winning_move(board, PLAYER_PIECE) or winning_move(board, AI_PIECE) or len(get_valid_locations(board)) == 0
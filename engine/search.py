@@ -0,0 +1,595 @@
+import math
+import time
+
+from .bitboard import AI_PIECE, PLAYER_PIECE, ZOBRIST_SIDE, CELL_COUNT
+from .threats import threat_score
+from .ordering import _to_front
+from .transposition import EXACT, LOWER, UPPER
+
+# https://en.wikipedia.org/wiki/Minimax#Pseudocode
+# https://en.wikipedia.org/wiki/Alpha%E2%80%93beta_pruning
+# https://en.wikipedia.org/wiki/Transposition_table
+#
+# minimax runs on a BitBoard: children are made and unmade on the one board
+# instead of copying it, and a node only checks whether the move into it
+# ended the game rather than scanning the board for both sides.
+#
+# Pass a TranspositionTable as tt to reuse results for positions already
+# searched, whether in this call or an earlier one. Keep the same table for
+# a whole game so later turns start from what earlier ones found. Entries
+# are keyed on the smaller of the position's and its mirror image's hash,
+# since both have the same value, and at the root of a position that is
+# its own mirror image only one of each pair of mirrored moves is searched.
+#
+# iterative_deepening wraps minimax in a per-move time budget: it searches
+# depth 1, 2, 3, ... and returns the last depth that finished in time.
+#
+# Pass an ordering object (see ordering.py) to choose the order children
+# are tried in, and a SearchStats to count nodes, cut-offs and table hits
+# and to time the parts of the search. Without an ordering, columns are
+# tried left to right after the table move.
+#
+# With threats=True the search also uses the threat analysis in threats.py:
+# a side that can win at once does, a single threat is blocked without
+# using up depth, moves under an opponent's threat are skipped, and leaves
+# add threat_score to score_position. Values then differ from the plain
+# search, so the golden positions are checked without it.
+#
+# Pass an evaluator (see evaluators.py) to score leaves with it instead of
+# score_position. With a batched one, such as the network in network.py, a
+# node one ply above the horizon scores all its children in one
+# evaluate_moves call before running alpha-beta over the scores, so the
+# evaluator is called once per node instead of once per leaf.
+
+WIN_SCORE = 10000000
+
+
+class SearchStats():
+    # Counters filled in by the search when passed as stats. Without one the
+    # search only pays for an `is not None` test per node.
+    #
+    # With timing=True the board is wrapped in a TimedBoard, and an
+    # evaluator in a TimedEvaluator, which add the time spent in win checks,
+    # scoring and make/unmake to the totals below.
+    # The timer calls slow the search down, so use it to see where the time
+    # goes rather than how much there is.
+
+    def __init__(self, timing=False):
+        self.timing = timing
+        self.nodes = 0
+        self.interior_nodes = 0
+        self.leaves = 0
+        self.terminal_checks = 0
+        self.terminals = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # cut-offs by ply below the root of the last search_root
+        self.cutoffs_by_ply = [0] * (CELL_COUNT + 1)
+        self.root = 0
+        self.roots = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.win_check_time = 0.0
+        self.evaluate_time = 0.0
+        self.make_unmake_time = 0.0
+        # (depth, nodes so far, ms so far) for every depth iterative_deepening finished
+        self.iterations = []
+
+    def cutoff_rate(self):
+        # fraction of expanded nodes that were cut off
+        return self.cutoffs / self.interior_nodes if self.interior_nodes else 0.0
+
+    def first_move_cutoff_rate(self):
+        # fraction of cut-offs made by the first move tried
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def branching_factor(self):
+        # children searched per expanded node
+        return (self.nodes - self.roots) / self.interior_nodes if self.interior_nodes else 0.0
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def as_dict(self):
+        plies = len(self.cutoffs_by_ply)
+        while plies and self.cutoffs_by_ply[plies - 1] == 0:
+            plies -= 1
+        return {'nodes': self.nodes, 'interior_nodes': self.interior_nodes,
+                'leaves': self.leaves, 'terminal_checks': self.terminal_checks,
+                'terminals': self.terminals,
+                'cutoffs': self.cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'cutoffs_by_ply': self.cutoffs_by_ply[:plies],
+                'cutoff_rate': self.cutoff_rate(),
+                'first_move_cutoff_rate': self.first_move_cutoff_rate(),
+                'branching_factor': self.branching_factor(),
+                'tt_probes': self.tt_probes, 'tt_hits': self.tt_hits, 'tt_cutoffs': self.tt_cutoffs,
+                'tt_hit_rate': self.tt_hit_rate(),
+                'win_check_ms': self.win_check_time * 1000,
+                'evaluate_ms': self.evaluate_time * 1000,
+                'make_unmake_ms': self.make_unmake_time * 1000,
+                'iterations': [list(i) for i in self.iterations]}
+
+    def write_json(self, f, **extra):
+        # one JSON object per line, with any extra fields (move number, time...)
+        # json is imported here, it would triple the cold import time of the search
+        import json
+        record = dict(extra)
+        record.update(self.as_dict())
+        f.write(json.dumps(record) + '\n')
+
+
+class TimedBoard():
+    # Stands in for a BitBoard, timing the calls the search makes into
+    # stats. Everything else is passed through to the real board.
+
+    def __init__(self, board, stats):
+        self.board = board
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.board, name)
+
+    def is_terminal_node(self):
+        start = time.perf_counter()
+        result = self.board.is_terminal_node()
+        self.stats.win_check_time += time.perf_counter() - start
+        return result
+
+    def winning_move(self, piece):
+        start = time.perf_counter()
+        result = self.board.winning_move(piece)
+        self.stats.win_check_time += time.perf_counter() - start
+        return result
+
+    def score_position(self, piece):
+        start = time.perf_counter()
+        result = self.board.score_position(piece)
+        self.stats.evaluate_time += time.perf_counter() - start
+        return result
+
+    def play(self, col, piece):
+        start = time.perf_counter()
+        self.board.play(col, piece)
+        self.stats.make_unmake_time += time.perf_counter() - start
+
+    def undo(self):
+        start = time.perf_counter()
+        self.board.undo()
+        self.stats.make_unmake_time += time.perf_counter() - start
+
+
+class TimedEvaluator():
+    # Stands in for an evaluator, timing its calls into stats.evaluate_time.
+    # It hands the evaluator the real board, so a score_position it calls
+    # isn't timed twice.
+
+    def __init__(self, evaluator, stats):
+        self.evaluator = evaluator
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.evaluator, name)
+
+    def evaluate(self, board, to_move):
+        if isinstance(board, TimedBoard):
+            board = board.board
+        start = time.perf_counter()
+        result = self.evaluator.evaluate(board, to_move)
+        self.stats.evaluate_time += time.perf_counter() - start
+        return result
+
+    def evaluate_moves(self, board, cols, k, piece):
+        if isinstance(board, TimedBoard):
+            board = board.board
+        start = time.perf_counter()
+        result = self.evaluator.evaluate_moves(board, cols, k, piece)
+        self.stats.evaluate_time += time.perf_counter() - start
+        return result
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Deadline():
+    def __init__(self, budget_ms):
+        self.end = time.perf_counter() + budget_ms / 1000
+        self.cancelled = False
+
+    def cancel(self):
+        # safe to call from another thread, the search stops at its next node
+        self.cancelled = True
+
+    def expired(self):
+        return self.cancelled or time.perf_counter() >= self.end
+
+
+class SearchBuffers():
+    # Scratch space for one search, one slot per ply (indexed by the stone
+    # count, like the board's move stack): the columns to try at that ply
+    # and the best one found there. minimax fills these instead of making
+    # lists and returning tuples, so once the buffers exist a node only
+    # allocates the integers its bit arithmetic produces.
+    def __init__(self, geometry):
+        self.moves = [[0] * geometry.cols for _ in range(geometry.cells + 1)]
+        self.best = [None] * (geometry.cells + 1)
+        # a node one ply above the horizon: its children's scores, and the
+        # columns of those the evaluator scores
+        self.scores = [[0] * geometry.cols for _ in range(geometry.cells + 1)]
+        self.leaves = [[0] * geometry.cols for _ in range(geometry.cells + 1)]
+
+
+_NEG_INF = -math.inf
+_INF = math.inf
+_LOSS = -WIN_SCORE
+
+
+def minimax(board, depth, alpha, beta, maximizingPlayer, tt=None, deadline=None, ordering=None, stats=None,
+            threats=False, buffers=None, evaluator=None):
+    # (column, value) of the best move for the side to move
+    if buffers is None:
+        buffers = SearchBuffers(board.geometry)
+    value = _minimax(board, depth, alpha, beta, maximizingPlayer, tt, deadline, ordering, stats, threats, buffers,
+                     evaluator)
+    return buffers.best[board.counter], value
+
+
+def _minimax(board, depth, alpha, beta, maximizingPlayer, tt, deadline, ordering, stats, threats, buffers, evaluator):
+    # minimax's recursion: returns the value and leaves the best column in
+    # buffers.best. The loops over the children are while loops: a for
+    # loop's iterator would stay allocated at every ply down the recursion,
+    # which benchmark.py's allocations/<phase> counts.
+    if deadline is not None and deadline.expired():
+        raise SearchTimeout
+    if stats is not None:
+        stats.nodes += 1
+        stats.terminal_checks += 1
+    counter = board.counter
+    best = buffers.best
+    # The game can only have just ended with the move that led here: only
+    # the side that made it can have four, and a draw is a full board.
+    if board.winning_move(PLAYER_PIECE if maximizingPlayer else AI_PIECE):
+        if stats is not None:
+            stats.terminals += 1
+        best[counter] = None
+        return _LOSS if maximizingPlayer else WIN_SCORE
+    if counter == board.geometry.cells:
+        if stats is not None:
+            stats.terminals += 1
+        best[counter] = None
+        return 0
+    piece = AI_PIECE if maximizingPlayer else PLAYER_PIECE
+    if depth == 0:
+        if stats is not None:
+            stats.leaves += 1
+        best[counter] = None
+        if evaluator is not None:
+            score = evaluator.evaluate(board, piece)
+        else:
+            score = board.score_position(AI_PIECE)
+        if threats:
+            return score + threat_score(board, piece)
+        return score
+
+    moves = buffers.moves[counter]
+    n = board.fill_valid_locations(moves)
+    if threats:
+        g = board.geometry
+        own = board.bits[piece]
+        mask = own | board.bits[PLAYER_PIECE + AI_PIECE - piece]
+        playable = (mask + g.bottom_mask) & g.board_mask
+        wins = g.winning_cells(own, mask) & playable
+        if wins:
+            best[counter] = _column_of(wins, g)
+            return WIN_SCORE if maximizingPlayer else _LOSS
+        opponent_wins = g.winning_cells(mask ^ own, mask)
+        forced = opponent_wins & playable
+        if forced & (forced - 1):
+            # two threats to block at once, the opponent wins next move
+            best[counter] = _column_of(forced, g)
+            return _LOSS if maximizingPlayer else WIN_SCORE
+        if forced:
+            # the one move that doesn't lose, searched a ply deeper for free
+            moves[0] = _column_of(forced, g)
+            n = 1
+            depth += 1
+        else:
+            # a stone right under an opponent's threat lets them play it
+            column_masks = g.column_masks
+            safe = 0
+            for i in range(n):
+                col = moves[i]
+                if not (playable & column_masks[col]) << 1 & opponent_wins:
+                    moves[safe] = col
+                    safe += 1
+            if safe:
+                n = safe
+
+    tt_move = None
+    if tt is not None:
+        # a position and its mirror image share an entry, with the move
+        # stored as it is played in the canonical one
+        key = board.hash
+        mirrored = board.mirror_hash < key
+        if mirrored:
+            key = board.mirror_hash
+        if not maximizingPlayer:
+            key ^= ZOBRIST_SIDE
+        slot = tt.probe(key)
+        if stats is not None:
+            stats.tt_probes += 1
+        if slot >= 0:
+            tt_move = tt.moves[slot]
+            if mirrored and tt_move is not None:
+                tt_move = board.geometry.cols - 1 - tt_move
+            if stats is not None:
+                stats.tt_hits += 1
+            if tt.depths[slot] >= depth:
+                tt_value = tt.values[slot]
+                tt_flag = tt.flags[slot]
+                if tt_flag == EXACT:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    best[counter] = tt_move
+                    return tt_value
+                elif tt_flag == LOWER:
+                    alpha = max(alpha, tt_value)
+                else:
+                    beta = min(beta, tt_value)
+                if alpha >= beta:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    best[counter] = tt_move
+                    return tt_value
+        alpha_orig = alpha
+        beta_orig = beta
+
+    if ordering is not None:
+        ordering.sort(board, moves, n, tt_move, piece)
+    elif tt_move is not None:
+        # try the stored best move first
+        _to_front(moves, n, tt_move)
+    if stats is not None:
+        stats.interior_nodes += 1
+
+    column = moves[0]
+    if depth == 1 and evaluator is not None and evaluator.batched:
+        # every child is a leaf: score them all in one call, then take them
+        # in order as the search would have
+        scores = _score_leaves(board, moves, n, piece, threats, buffers, stats, evaluator)
+        value = _NEG_INF if maximizingPlayer else _INF
+        for i in range(n):
+            new_score = scores[i]
+            if maximizingPlayer:
+                if new_score > value:
+                    value = new_score
+                    column = moves[i]
+                alpha = max(alpha, value)
+            else:
+                if new_score < value:
+                    value = new_score
+                    column = moves[i]
+                beta = min(beta, value)
+            if alpha >= beta:
+                _cutoff(board, moves[i], piece, depth, i, ordering, stats)
+                break
+    elif maximizingPlayer:
+        value = _NEG_INF
+        i = 0
+        while i < n:
+            col = moves[i]
+            board.play(col, AI_PIECE)
+            new_score = _minimax(board, depth-1, alpha, beta, False, tt, deadline, ordering, stats, threats, buffers,
+                                 evaluator)
+            board.undo()
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                _cutoff(board, col, piece, depth, i, ordering, stats)
+                break
+            i += 1
+    else: #minimising player
+        value = _INF
+        i = 0
+        while i < n:
+            col = moves[i]
+            board.play(col, PLAYER_PIECE)
+            new_score = _minimax(board, depth-1, alpha, beta, True, tt, deadline, ordering, stats, threats, buffers,
+                                 evaluator)
+            board.undo()
+            if new_score < value:
+                value = new_score
+                column = col
+            beta = min(beta, value)
+            if alpha >= beta:
+                _cutoff(board, col, piece, depth, i, ordering, stats)
+                break
+            i += 1
+
+    if tt is not None:
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(key, depth, value, flag, board.geometry.cols - 1 - column if mirrored else column)
+    best[counter] = column
+    return value
+
+
+def _score_leaves(board, moves, n, piece, threats, buffers, stats, evaluator):
+    # the values of the n children of a node at depth 1, as _minimax would
+    # give them at depth 0: a child that ends the game is scored here and
+    # the rest go to the evaluator together. Children after a cut-off are
+    # scored too, and counted as searched.
+    counter = board.counter
+    scores = buffers.scores[counter]
+    leaves = buffers.leaves[counter]
+    other = PLAYER_PIECE + AI_PIECE - piece
+    cells = board.geometry.cells
+    k = 0
+    for i in range(n):
+        board.play(moves[i], piece)
+        if board.winning_move(piece):
+            scores[i] = WIN_SCORE if piece == AI_PIECE else _LOSS
+        elif board.counter == cells:
+            scores[i] = 0
+        else:
+            leaves[k] = moves[i]
+            k += 1
+            scores[i] = threat_score(board, other) if threats else 0
+        board.undo()
+    if stats is not None:
+        stats.nodes += n
+        stats.terminal_checks += n
+        stats.terminals += n - k
+        stats.leaves += k
+    if k:
+        values = evaluator.evaluate_moves(board, leaves, k, piece)
+        # the leaves are in move order, so fill the gaps left for them
+        i = 0
+        j = 0
+        while j < k:
+            if moves[i] == leaves[j]:
+                scores[i] += values[j]
+                j += 1
+            i += 1
+    return scores
+
+
+def _column_of(cells, geometry):
+    # column of the lowest set cell
+    return ((cells & -cells).bit_length() - 1) // geometry.h1
+
+
+def _cutoff(board, col, piece, depth, index, ordering, stats):
+    if ordering is not None:
+        ordering.cutoff(board, col, piece, depth)
+    if stats is not None:
+        stats.cutoffs += 1
+        ply = board.counter - stats.root
+        if ply >= len(stats.cutoffs_by_ply):
+            # a bigger board than the standard one
+            stats.cutoffs_by_ply += [0] * (ply + 1 - len(stats.cutoffs_by_ply))
+        stats.cutoffs_by_ply[ply] += 1
+        if index == 0:
+            stats.first_move_cutoffs += 1
+
+
+def unique_moves(board, order):
+    # order without the moves that are mirror images of earlier ones, which
+    # only differ in a position that is its own mirror image
+    if not board.is_symmetric():
+        return order
+    last = board.geometry.cols - 1
+    return [col for i, col in enumerate(order) if last - col not in order[:i]]
+
+
+def search_root(board, depth, order, maximizingPlayer=True, tt=None, deadline=None, ordering=None, stats=None,
+                threats=False, buffers=None, evaluator=None):
+    # minimax at the root, trying the columns in the given order
+    order = unique_moves(board, order)
+    if buffers is None:
+        buffers = SearchBuffers(board.geometry)
+    alpha = -math.inf
+    beta = math.inf
+    column = order[0]
+    if stats is not None:
+        stats.nodes += 1
+        stats.interior_nodes += 1
+        stats.roots += 1
+        stats.root = board.counter
+        if stats.timing and not isinstance(board, TimedBoard):
+            board = TimedBoard(board, stats)
+        if stats.timing and evaluator is not None and not isinstance(evaluator, TimedEvaluator):
+            evaluator = TimedEvaluator(evaluator, stats)
+    if maximizingPlayer:
+        value = -math.inf
+        for col in order:
+            board.play(col, AI_PIECE)
+            new_score = _minimax(board, depth-1, alpha, beta, False, tt, deadline, ordering, stats, threats, buffers,
+                                 evaluator)
+            board.undo()
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+    else:
+        value = math.inf
+        for col in order:
+            board.play(col, PLAYER_PIECE)
+            new_score = _minimax(board, depth-1, alpha, beta, True, tt, deadline, ordering, stats, threats, buffers,
+                                 evaluator)
+            board.undo()
+            if new_score < value:
+                value = new_score
+                column = col
+            beta = min(beta, value)
+    return column, value
+
+
+def iterative_deepening(board, time_budget_ms, max_depth=None, tt=None, maximizingPlayer=True, ordering=None, stats=None,
+                        deadline=None, book=None, threats=False, evaluator=None):
+    # Returns (column, value, depth) from the deepest search that completed
+    # within time_budget_ms. Depth 1 always completes so there is a move.
+    # Pass a Deadline instead to be able to cancel the search early.
+    # Positions in the OpeningBook given as book are answered without
+    # searching, with the depth the book was built at.
+    if book is not None and maximizingPlayer:
+        entry = book.lookup(board)
+        if entry is not None:
+            return entry[0], entry[1], book.depth
+    if max_depth is None:
+        max_depth = board.geometry.cells
+    max_depth = min(max_depth, board.geometry.cells - board.counter)
+    if deadline is None:
+        deadline = Deadline(time_budget_ms)
+    counter = board.counter
+    piece = AI_PIECE if maximizingPlayer else PLAYER_PIECE
+    if ordering is not None:
+        order = ordering.order(board, board.get_valid_locations(), None, piece)
+    else:
+        order = board.get_valid_locations()
+    start = time.perf_counter()
+    buffers = SearchBuffers(board.geometry)
+    column, value = search_root(board, 1, order, maximizingPlayer, tt, None, ordering, stats, threats, buffers,
+                                evaluator)
+    depth = 1
+    if stats is not None:
+        stats.iterations.append((depth, stats.nodes, (time.perf_counter() - start) * 1000))
+    while depth < max_depth and abs(value) < WIN_SCORE:
+        # the previous best move goes first
+        order.remove(column)
+        order.insert(0, column)
+        try:
+            result = search_root(board, depth+1, order, maximizingPlayer, tt, deadline, ordering, stats, threats,
+                                 buffers, evaluator)
+        except SearchTimeout:
+            while board.counter > counter:
+                board.undo()
+            break
+        column, value = result
+        depth += 1
+        if stats is not None:
+            stats.iterations.append((depth, stats.nodes, (time.perf_counter() - start) * 1000))
+    return column, value, depth
+
+
+def pick_best_move(board, piece):
+    # The move with the best score_position one ply ahead, no search
+    valid_locations = board.get_valid_locations()
+    best_score = -math.inf
+    best_col = valid_locations[0]
+    for col in valid_locations:
+        board.play(col, piece)
+        score = board.score_position(piece)
+        board.undo()
+        if score > best_score:
+            best_score = score
+            best_col = col
+
+    return best_col
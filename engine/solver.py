@@ -0,0 +1,217 @@
+import time
+from array import array
+
+from .bitboard import (ROW_COUNT, COLUMN_COUNT, CELL_COUNT, H1, BOTTOM_MASK, BOARD_MASK,
+                       mirror_bits, has_four)
+from .geometry import STANDARD
+from .threats import winning_cells
+
+# Perfect-play solver.
+#
+# minimax stops at a fixed depth and guesses with score_position; this
+# searches to the end of the game and returns the exact result:
+#   score > 0  the side to move wins, with score - 1 of its own stones to spare
+#   score == 0 draw
+#   score < 0  the side to move loses
+# i.e. a win on your n-th stone scores (CELL_COUNT + 1) // 2 + 1 - n.
+#
+# It is a negamax over (position, mask) integers, where position holds the
+# stones of the side to move and mask all stones, following
+# http://blog.gamesolver.org/. What keeps it fast:
+#   - null-window searches that binary-search the score
+#   - moves that hand the opponent an immediate win are never tried, and a
+#     position where the opponent has two threats is a loss on the spot
+#   - moves are ordered by how many winning cells they create
+#   - a transposition table of upper bounds keyed on the smaller of the
+#     position's key and its mirror image's
+
+
+def _div2(n):
+    # integer division by 2 rounding towards zero
+    return -(-n // 2) if n < 0 else n // 2
+
+
+def _sign(n):
+    return (n > 0) - (n < 0)
+
+
+def _column_mask(col):
+    return ((1 << ROW_COUNT) - 1) << (col * H1)
+
+
+MIN_SCORE = -(CELL_COUNT // 2) + 3
+MAX_SCORE = (CELL_COUNT + 1) // 2 - 3
+
+# centre columns first
+SOLVE_ORDER = tuple(sorted(range(COLUMN_COUNT), key=lambda c: abs(c - COLUMN_COUNT // 2)))
+COLUMN_MASKS = tuple(_column_mask(col) for col in range(COLUMN_COUNT))
+
+
+def _check_geometry(board):
+    # the bit tricks above are written for the 6x7 board
+    if board.geometry is not STANDARD:
+        raise ValueError('the solver only solves %r boards, not %r' % (STANDARD, board.geometry))
+
+
+def _next_prime(n):
+    def is_prime(m):
+        if m < 2:
+            return False
+        i = 2
+        while i * i <= m:
+            if m % i == 0:
+                return False
+            i += 1
+        return True
+    while not is_prime(n):
+        n += 1
+    return n
+
+
+class Solver():
+    def __init__(self, table_size=1 << 21):
+        # keys are stored in full, values as score - MIN_SCORE + 1, 0 = empty
+        self.table_size = _next_prime(table_size)
+        self.keys = array('Q', bytes(8 * self.table_size))
+        self.values = array('b', bytes(self.table_size))
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def reset(self):
+        self.keys = array('Q', bytes(8 * self.table_size))
+        self.values = array('b', bytes(self.table_size))
+
+    def _key(self, position, mask):
+        # same layout as BitBoard.key(), never 0 so empty slots can't match
+        key = position + mask + BOTTOM_MASK
+        mirrored = mirror_bits(position) + mirror_bits(mask) + BOTTOM_MASK
+        return mirrored if mirrored < key else key
+
+    def _non_losing_moves(self, position, mask):
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponent_wins = winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # two threats at once, every move loses
+                return 0
+            possible = forced
+        # never play directly below a cell the opponent wins on
+        return possible & ~(opponent_wins >> 1)
+
+    def _negamax(self, position, mask, moves, alpha, beta):
+        # the side to move can't win immediately, solve() and the parent's
+        # move filtering make sure of that
+        self.nodes += 1
+        playable = self._non_losing_moves(position, mask)
+        if playable == 0:
+            return -((CELL_COUNT - moves) // 2)
+        if moves >= CELL_COUNT - 2:
+            return 0
+
+        lo = -((CELL_COUNT - 2 - moves) // 2)
+        if alpha < lo:
+            alpha = lo
+            if alpha >= beta:
+                return alpha
+        hi = (CELL_COUNT - 1 - moves) // 2
+        key = self._key(position, mask)
+        slot = key % self.table_size
+        if self.keys[slot] == key:
+            hi = self.values[slot] + MIN_SCORE - 1
+        if beta > hi:
+            beta = hi
+            if alpha >= beta:
+                return beta
+
+        # order by the number of winning cells each move leaves us
+        candidates = []
+        for col in SOLVE_ORDER:
+            move = playable & COLUMN_MASKS[col]
+            if move:
+                threats = winning_cells(position | move, mask).bit_count()
+                candidates.append((threats, -len(candidates), move))
+        candidates.sort(reverse=True)
+
+        opponent = position ^ mask
+        for _, _, move in candidates:
+            new_mask = mask | move
+            score = -self._negamax(opponent, new_mask, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.keys[slot] = key
+        self.values[slot] = alpha - MIN_SCORE + 1
+        return alpha
+
+    def solve_bits(self, position, mask, moves, weak=False):
+        # exact score for the side whose stones are position; weak only
+        # tells win (1), draw (0) or loss (-1)
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        if winning_cells(position, mask) & possible:
+            return 1 if weak else (CELL_COUNT + 1 - moves) // 2
+        lo = -((CELL_COUNT - moves) // 2)
+        hi = (CELL_COUNT + 1 - moves) // 2
+        if weak:
+            lo = -1
+            hi = 1
+        while lo < hi:
+            med = lo + _div2(hi - lo)
+            if med <= 0 and _div2(lo) < med:
+                med = _div2(lo)
+            elif med >= 0 and _div2(hi) > med:
+                med = _div2(hi)
+            r = self._negamax(position, mask, moves, med, med + 1)
+            if r <= med:
+                hi = r
+            else:
+                lo = r
+        # the null-window searches fail soft, so a weak search can finish
+        # on a score outside -1..1
+        return _sign(lo) if weak else lo
+
+    def solve(self, board, piece, weak=False):
+        # exact score for piece, which must be the side to move on board
+        start = time.perf_counter()
+        self.nodes = 0
+        _check_geometry(board)
+        if has_four(board.mask ^ board.bits[piece]):
+            raise ValueError('the game is already over')
+        score = self.solve_bits(board.bits[piece], board.mask, board.counter, weak)
+        self.seconds = time.perf_counter() - start
+        return score
+
+    def analyze(self, board, piece, weak=False):
+        # score of every valid column for piece, None for full columns
+        start = time.perf_counter()
+        self.nodes = 0
+        _check_geometry(board)
+        position = board.bits[piece]
+        mask = board.mask
+        scores = [None] * COLUMN_COUNT
+        for col in board.get_valid_locations():
+            move = (mask + BOTTOM_MASK) & COLUMN_MASKS[col]
+            if has_four(position | move):
+                scores[col] = 1 if weak else (CELL_COUNT + 1 - board.counter) // 2
+            elif board.counter + 1 == CELL_COUNT:
+                scores[col] = 0
+            else:
+                new_mask = mask | move
+                scores[col] = -self.solve_bits(position ^ mask, new_mask, board.counter + 1, weak)
+        self.seconds = time.perf_counter() - start
+        return scores
+
+    def best_move(self, board, piece):
+        # (column, score) with the best exact score, centre first on ties
+        scores = self.analyze(board, piece)
+        best = None
+        for col in SOLVE_ORDER:
+            if scores[col] is not None and (best is None or scores[col] > scores[best]):
+                best = col
+        return best, scores[best]
+
+    def stats(self):
+        return {'nodes': self.nodes, 'seconds': self.seconds,
+                'nodes_per_second': self.nodes / self.seconds if self.seconds else 0.0}
@@ -0,0 +1,54 @@
+from .bitboard import PLAYER_PIECE, AI_PIECE
+from .geometry import STANDARD
+
+# Threat analysis with bitboard operations.
+#
+# A threat is an empty cell that would complete four for one side. What
+# matters about it:
+#   - whether it can be played now (the cell below is filled), because
+#     then the side to move either wins on it or must block it
+#   - its row. Late in a game the stones fill up in pairs, and the first
+#     player can usually force the odd rows (1, 3, 5 counting from the
+#     bottom) and the second player the even ones, so an odd threat wins
+#     for the first player and an even threat for the second.
+#
+# minimax uses these when called with threats=True (see search.py):
+# winning immediately, blocking a single threat without spending depth,
+# never playing under an opponent's threat, and threat_score added to
+# score_position at the leaves.
+#
+# threat_score reads the board's Geometry, so it works on any board size
+# and line length; winning_cells on bare bitmaps is the standard board's.
+
+# weights of threat_score, in score_position's units
+GOOD_THREAT = 20
+OTHER_THREAT = 5
+PLAYABLE_THREAT = 50
+
+
+# the standard board's, for the solver
+winning_cells = STANDARD.winning_cells
+
+
+def first_player(board, to_move):
+    # the piece that moved first, which is to move whenever the stone count is even
+    return to_move if board.counter % 2 == 0 else PLAYER_PIECE + AI_PIECE - to_move
+
+
+def threat_score(board, to_move):
+    # threat term for the evaluator, from the AI's side like score_position(AI_PIECE)
+    g = board.geometry
+    mask = board.bits[PLAYER_PIECE] | board.bits[AI_PIECE]
+    moves = (mask + g.bottom_mask) & g.board_mask
+    first = first_player(board, to_move)
+    score = 0
+    for piece, sign in ((AI_PIECE, 1), (PLAYER_PIECE, -1)):
+        cells = g.winning_cells(board.bits[piece], mask)
+        if not cells:
+            continue
+        good = (cells & (g.odd_rows if piece == first else g.even_rows)).bit_count()
+        value = good * GOOD_THREAT + (cells.bit_count() - good) * OTHER_THREAT
+        if piece == to_move and cells & moves:
+            value += PLAYABLE_THREAT
+        score += sign * value
+    return score
@@ -0,0 +1,85 @@
+# Transposition table for the bitboard search.
+#
+# Entries are keyed by the board's Zobrist hash. The table is split into
+# buckets of two slots: the first slot keeps the deepest search seen for
+# the bucket, the second always takes the newest entry. A deep result is
+# only pushed out by an equal or deeper one, but shallow results near the
+# leaves still get cached.
+#
+# The columns of an entry live in parallel lists rather than one object
+# per entry, which keeps a large table cheap to allocate.
+
+EXACT = 0
+LOWER = 1  # value is a lower bound, the search failed high
+UPPER = 2  # value is an upper bound, the search failed low
+
+
+class TranspositionTable():
+    def __init__(self, size=1 << 17):
+        # size is the number of entries, rounded up to a power of two
+        buckets = 1
+        while buckets * 2 < size:
+            buckets *= 2
+        self.size = buckets * 2
+        self.index_mask = buckets - 1
+        self.keys = [None] * self.size
+        self.depths = [-1] * self.size
+        self.values = [0] * self.size
+        self.flags = [EXACT] * self.size
+        self.moves = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        self.__init__(self.size)
+
+    def lookup(self, key):
+        # returns (depth, value, flag, move) or None
+        i = self.probe(key)
+        if i < 0:
+            return None
+        return self.depths[i], self.values[i], self.flags[i], self.moves[i]
+
+    def probe(self, key):
+        # slot holding key, or -1; the search reads the entry's columns
+        # from the slot, so a probe builds no tuple
+        i = (key & self.index_mask) << 1
+        keys = self.keys
+        if keys[i] != key:
+            if keys[i + 1] != key:
+                self.misses += 1
+                if keys[i] is not None:
+                    self.collisions += 1
+                return -1
+            i += 1
+        self.hits += 1
+        return i
+
+    def store(self, key, depth, value, flag, move):
+        i = (key & self.index_mask) << 1
+        keys = self.keys
+        depths = self.depths
+        if keys[i] == key or depth >= depths[i]:
+            if keys[i] != key and keys[i] is not None:
+                # demote the old deep entry to the always-replace slot
+                self._write(i + 1, keys[i], depths[i], self.values[i], self.flags[i], self.moves[i])
+            elif keys[i + 1] == key:
+                keys[i + 1] = None
+                depths[i + 1] = -1
+        else:
+            i += 1
+        self._write(i, key, depth, value, flag, move)
+        self.stores += 1
+
+    def _write(self, i, key, depth, value, flag, move):
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.values[i] = value
+        self.flags[i] = flag
+        self.moves[i] = move
+
+    def stats(self):
+        return {'size': self.size, 'hits': self.hits, 'misses': self.misses,
+                'collisions': self.collisions, 'stores': self.stores}
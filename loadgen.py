@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from engine.bitboard import BitBoard, PLAYER_PIECE, AI_PIECE, CELL_COUNT
+from move_server import percentile
+
+# Load generator for move_server.py.
+#
+#   python loadgen.py --games 64 --requests 2000 --budget-ms 200
+#
+# Runs --games simulated games at once, each on its own connection: the
+# human side plays random moves and the AI side asks the server. A game
+# that ends starts again from the empty board, so the opening positions
+# come up often and exercise the server's sharing of identical searches.
+# Prints the client-side latency and throughput, then the server's own
+# metrics.
+
+
+async def play(host, port, budget_ms, depth, rng, remaining, latencies, shared):
+    reader, writer = await asyncio.open_connection(host, port)
+    board = BitBoard()
+    piece = PLAYER_PIECE
+    try:
+        while remaining[0] > 0:
+            if piece == AI_PIECE:
+                remaining[0] -= 1
+                request = {'id': remaining[0], 'moves': ''.join(str(c) for c in board.moves[:board.counter]),
+                           'budget_ms': budget_ms}
+                if depth:
+                    request['depth'] = depth
+                start = time.perf_counter()
+                writer.write((json.dumps(request) + '\n').encode())
+                reply = json.loads(await reader.readline())
+                latencies.append((time.perf_counter() - start) * 1000)
+                if 'error' in reply:
+                    raise SystemExit('server error: %s' % reply['error'])
+                shared[0] += reply['shared']
+                col = reply['column']
+            else:
+                col = rng.choice(board.get_valid_locations())
+            board.play(col, piece)
+            if board.winning_move(piece) or board.counter == CELL_COUNT:
+                board = BitBoard()
+                piece = PLAYER_PIECE
+            else:
+                piece = PLAYER_PIECE + AI_PIECE - piece
+    finally:
+        writer.close()
+
+
+async def metrics(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"op": "metrics"}\n')
+    reply = json.loads(await reader.readline())
+    writer.close()
+    return reply
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    remaining = [args.requests]
+    latencies = []
+    shared = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*[play(args.host, args.port, args.budget_ms, args.depth, random.Random(rng.random()),
+                                remaining, latencies, shared) for _ in range(args.games)])
+    elapsed = time.perf_counter() - start
+    print('%d requests from %d games in %.1f s, %.1f requests/s, %d shared' %
+          (len(latencies), args.games, elapsed, len(latencies) / elapsed, shared[0]))
+    print('client latency: p50 %.1f ms  p99 %.1f ms  max %.1f ms' %
+          (percentile(latencies, 0.50), percentile(latencies, 0.99), max(latencies, default=0.0)))
+    print('server: %s' % json.dumps(await metrics(args.host, args.port)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send concurrent move requests to move_server.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--games', type=int, default=32, help='games played at once')
+    parser.add_argument('--requests', type=int, default=1000, help='AI moves to ask for in total')
+    parser.add_argument('--budget-ms', type=float, default=200)
+    parser.add_argument('--depth', type=int, help='maximum search depth')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from engine.bitboard import PLAYER_PIECE, AI_PIECE, CELL_COUNT
+from engine.encoding import encode, decode, from_moves
+from engine.ordering import KillerHistoryOrdering
+from engine.search import iterative_deepening
+from engine.transposition import TranspositionTable
+
+# Move server: answers AI move requests for many games at once.
+#
+#   python move_server.py --port 8765 --workers 4
+#   python loadgen.py --port 8765
+#
+# Clients connect over TCP and send one JSON object per line:
+#   {"id": 1, "moves": "3342", "budget_ms": 500, "depth": 6}
+# moves are the columns played from an empty board, and the move is
+# searched for whoever is to move. budget_ms is at most MAX_BUDGET_MS,
+# and depth is optional, MAX_DEPTH if not given. The reply is a line
+#   {"id": 1, "column": 2, "value": 17, "depth": 6, "ms": 512.3, "shared": false}
+# with value scored for the side to move, or {"id": 1, "error": "..."}.
+# {"op": "metrics"} returns request counts, queue depth and p50/p99
+# latency instead. Replies on one connection come back as they finish,
+# not in request order.
+#
+# Requests wait in a queue for one of the worker processes. The budget
+# counts from when a request arrives, so time spent queueing comes out of
+# the search; a request that runs out of time still gets a depth 1 move.
+# A request for a position that is already queued or being searched
+# waits for that search instead of starting another ("shared": true). If
+# its own budget runs out first it stops waiting and gets a depth 1 move
+# searched on the spot.
+#
+# Each worker keeps its own transposition table and move ordering for all
+# the games it serves.
+
+LATENCY_WINDOW = 10000
+WORKER_TABLE_SIZE = 1 << 18
+# longer budgets are cut to this
+MAX_BUDGET_MS = 10000
+# depth searched to when a request doesn't give one; the budget usually
+# stops the search well before
+MAX_DEPTH = 20
+
+_tt = None
+_ordering = None
+
+
+def _search(key, budget_ms, max_depth):
+    global _tt, _ordering
+    if _tt is None:
+        _tt = TranspositionTable(WORKER_TABLE_SIZE)
+        _ordering = KillerHistoryOrdering()
+    return _best_move(decode(key), budget_ms, max_depth, _tt, _ordering)
+
+
+def _best_move(board, budget_ms, max_depth, tt=None, ordering=None):
+    ai_to_move = board.counter % 2 == 1
+    column, value, depth = iterative_deepening(board, max(budget_ms, 0), max_depth, tt, ai_to_move, ordering)
+    # the search scores for the AI, the reply for the side to move
+    return column, value if ai_to_move else -value, depth
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def parse_request(request):
+    # (board, budget_ms, max_depth) for a move request, ValueError if it's bad
+    moves = str(request.get('moves', ''))
+    budget_ms = float(request.get('budget_ms', 1000))
+    # a NaN or infinite budget would never run out
+    if not math.isfinite(budget_ms):
+        raise ValueError('budget_ms must be a finite number')
+    budget_ms = min(budget_ms, MAX_BUDGET_MS)
+    max_depth = request.get('depth', MAX_DEPTH)
+    # bool is an int, but true isn't a depth
+    if not isinstance(max_depth, int) or isinstance(max_depth, bool) or max_depth < 1:
+        raise ValueError('depth must be a positive integer')
+    if not moves.isdigit() and moves:
+        raise ValueError('moves must be column digits, not %r' % moves)
+    board = from_moves(moves)
+    last = AI_PIECE if board.counter % 2 == 0 else PLAYER_PIECE
+    if board.winning_move(last) or board.counter == CELL_COUNT:
+        raise ValueError('the game is already over')
+    return board, budget_ms, max_depth
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MoveServer():
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for future in [self.executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        self.queue = asyncio.Queue()
+        # position -> future of its search, for every queued or running search
+        self.in_flight = {}
+        self.running = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.shared = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.dispatchers = []
+
+    def start(self):
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+    def metrics(self):
+        latencies = list(self.latencies)
+        return {'requests': self.requests, 'shared': self.shared, 'errors': self.errors,
+                'queue_depth': self.queue.qsize(), 'max_queue_depth': self.max_queue_depth,
+                'running': self.running, 'workers': self.workers,
+                'p50_ms': percentile(latencies, 0.50), 'p99_ms': percentile(latencies, 0.99)}
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, deadline, max_depth, future = await self.queue.get()
+            self.running += 1
+            try:
+                budget_ms = (deadline - time.perf_counter()) * 1000
+                result = await loop.run_in_executor(self.executor, _search, key[0], budget_ms, max_depth)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.running -= 1
+                del self.in_flight[key]
+
+    async def move(self, board, budget_ms, max_depth):
+        # (column, value, depth, shared) for the side to move on board
+        received = time.perf_counter()
+        key = (encode(board), max_depth)
+        future = self.in_flight.get(key)
+        shared = future is not None
+        if not shared:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            self.queue.put_nowait((key, received + budget_ms / 1000, max_depth, future))
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+            column, value, depth = await asyncio.shield(future)
+            return column, value, depth, shared
+        # the search was started for another request, with its deadline
+        self.shared += 1
+        try:
+            column, value, depth = await asyncio.wait_for(asyncio.shield(future), max(budget_ms, 0) / 1000)
+        except asyncio.TimeoutError:
+            column, value, depth = _best_move(board, 0, 1)
+        return column, value, depth, shared
+
+    async def _answer(self, request, writer):
+        received = time.perf_counter()
+        self.requests += 1
+        reply = {'id': request.get('id')}
+        try:
+            board, budget_ms, max_depth = parse_request(request)
+            column, value, depth, shared = await self.move(board, budget_ms, max_depth)
+            reply.update(column=column, value=value, depth=depth, shared=shared)
+        except (ValueError, TypeError) as e:
+            # a bad request
+            self.errors += 1
+            reply['error'] = str(e)
+        except Exception as e:
+            # the search failed, e.g. a worker process died; the client
+            # still gets a reply for the id
+            self.errors += 1
+            reply['error'] = 'search failed: %s: %s' % (type(e).__name__, e)
+        ms = (time.perf_counter() - received) * 1000
+        if 'error' not in reply:
+            self.latencies.append(ms)
+        reply['ms'] = ms
+        writer.write((json.dumps(reply) + '\n').encode())
+
+    async def handle(self, reader, writer):
+        # one client connection, which may have many requests outstanding
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('a request must be a JSON object')
+                except ValueError as e:
+                    self.errors += 1
+                    writer.write((json.dumps({'error': str(e)}) + '\n').encode())
+                    continue
+                if request.get('op') == 'metrics':
+                    writer.write((json.dumps(self.metrics()) + '\n').encode())
+                    continue
+                task = asyncio.create_task(self._answer(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, workers):
+    server = MoveServer(workers)
+    server.start()
+    listener = await asyncio.start_server(server.handle, host, port)
+    print('serving on %s:%d with %d workers' % (host, port, server.workers))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve AI moves for many games over JSON lines')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
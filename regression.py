@@ -0,0 +1,251 @@
+import argparse
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from engine import evaluate, search
+from engine.bitboard import BitBoard, PLAYER_PIECE, AI_PIECE
+from engine.geometry import Geometry, get_geometry
+from engine.encoding import from_moves
+from engine.solver import Solver
+
+# Golden-position regression suite for the evaluator and the search.
+#
+# golden_positions.txt holds a few thousand positions from seeded games,
+# each with score_position for both pieces and the best columns for the
+# AI at GOLDEN_DEPTH. Every evaluator and search in the repo is checked
+# for exact agreement with it, and timed on the same positions:
+#
+#   python regression.py            check and time everything
+#   python regression.py --update   rewrite the corpus (only after an
+#                                   intentional change to the heuristic)
+#
+# A line is: moves score_player score_ai best_columns value
+# where moves are the columns played from an empty board, the player
+# first, or '.' for the empty board.
+#
+# The win check and the threat cells of other board sizes and line
+# lengths (see engine/geometry.py) are checked against a brute-force scan
+# of every window, on random positions of each of GEOMETRIES.
+#
+# The solver's weak mode is checked to give the sign of its exact score,
+# for the position and every move from it, on the golden positions with
+# at least SOLVER_MIN_MOVES stones (most have a win on the next move) and
+# SOLVER_POSITIONS.
+
+GOLDEN_FILE = 'golden_positions.txt'
+GOLDEN_DEPTH = 4
+GOLDEN_COUNT = 3000
+GOLDEN_SEED = 6
+# (rows, cols, connect); 6x7 connect 4 is checked with the general code
+# as well as the written-out version
+GEOMETRIES = [(6, 7, 4), (7, 8, 5), (9, 10, 6), (5, 5, 3), (4, 9, 4)]
+GEOMETRY_POSITIONS = 500
+SOLVER_MIN_MOVES = 20
+# the side to move wins at once in column 2
+SOLVER_POSITIONS = ['441243540406324116355336116']
+
+
+def best_columns(bb, depth):
+    # exact value of every root move, so ties are all recorded
+    values = {}
+    for col in bb.get_valid_locations():
+        bb.play(col, AI_PIECE)
+        values[col] = search.minimax(bb, depth - 1, -math.inf, math.inf, False)[1]
+        bb.undo()
+    value = max(values.values())
+    return [col for col in values if values[col] == value], value
+
+
+def generate(count, seed):
+    # games with a mix of random and greedy moves, stopped at a random ply
+    rng = random.Random(seed)
+    positions = []
+    seen = set()
+    while len(positions) < count:
+        bb = BitBoard()
+        moves = []
+        piece = PLAYER_PIECE
+        stop = rng.randint(0, 40)
+        while len(moves) < stop:
+            valid = bb.get_valid_locations()
+            if rng.random() < 0.5:
+                col = rng.choice(valid)
+            else:
+                col = max(valid, key=lambda c: _greedy_score(bb, c, piece))
+            bb.play(col, piece)
+            if bb.is_terminal_node():
+                bb.undo()
+                break
+            moves.append(col)
+            piece = PLAYER_PIECE + AI_PIECE - piece
+        key = tuple(moves)
+        if key not in seen:
+            seen.add(key)
+            positions.append(moves)
+    return positions
+
+
+def _greedy_score(bb, col, piece):
+    bb.play(col, piece)
+    score = bb.score_position(piece)
+    bb.undo()
+    return score
+
+
+def write_golden(path, count, seed, depth):
+    with open(path, 'w') as f:
+        f.write('# moves score_player score_ai best_columns value (depth %d)\n' % depth)
+        for moves in generate(count, seed):
+            bb = from_moves(moves)
+            cols, value = best_columns(bb, depth)
+            f.write('%s %d %d %s %d\n' % (''.join(map(str, moves)) or '.',
+                                          bb.score_position(PLAYER_PIECE), bb.score_position(AI_PIECE),
+                                          ''.join(map(str, cols)), value))
+
+
+def read_golden(path):
+    positions = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            moves, score_player, score_ai, cols, value = line.split()
+            moves = [] if moves == '.' else [int(c) for c in moves]
+            positions.append((moves, int(score_player), int(score_ai),
+                              [int(c) for c in cols], int(value)))
+    return positions
+
+
+def check(positions, depth):
+    failures = 0
+    bitboards = [from_moves(p[0]) for p in positions]
+    arrays = [bb.to_array() for bb in bitboards]
+    stack = np.array(arrays)
+    expected = {piece: [p[piece] for p in positions] for piece in (PLAYER_PIECE, AI_PIECE)}
+
+    evaluators = [
+        ('BitBoard.score_position', lambda piece: [bb.score_position(piece) for bb in bitboards]),
+        ('evaluate.score_position', lambda piece: [evaluate.score_position(b, piece) for b in arrays]),
+        ('evaluate.score_boards', lambda piece: list(evaluate.score_boards(stack, piece))),
+    ]
+    for name, run in evaluators:
+        start = time.perf_counter()
+        got = {piece: run(piece) for piece in (PLAYER_PIECE, AI_PIECE)}
+        elapsed = time.perf_counter() - start
+        bad = sum(got[piece][i] != expected[piece][i]
+                  for piece in (PLAYER_PIECE, AI_PIECE) for i in range(len(positions)))
+        failures += bad
+        print('%-26s %6d mismatches %9.2f us/position' % (name, bad, elapsed / (2 * len(positions)) * 1e6))
+
+    # every child of every position, for both pieces and either mover,
+    # against BitBoard.score_position of the child (checked above)
+    bad = 0
+    elapsed = 0.0
+    for bb, board, p in zip(bitboards, arrays, positions):
+        for piece in (PLAYER_PIECE, AI_PIECE):
+            for mover in (PLAYER_PIECE, AI_PIECE):
+                start = time.perf_counter()
+                cols, scores = evaluate.score_children(board, piece, mover, p[piece])
+                elapsed += time.perf_counter() - start
+                if list(cols) != bb.get_valid_locations():
+                    bad += 1
+                    continue
+                for col, score in zip(cols, scores):
+                    bb.play(int(col), mover)
+                    bad += score != bb.score_position(piece)
+                    bb.undo()
+    failures += bad
+    print('%-26s %6d mismatches %9.2f us/position' % ('evaluate.score_children', bad,
+                                                      elapsed / (4 * len(positions)) * 1e6))
+
+    bad = 0
+    start = time.perf_counter()
+    for bb, p in zip(bitboards, positions):
+        col, value = search.minimax(bb, depth, -math.inf, math.inf, True)
+        if value != p[4] or col not in p[3]:
+            bad += 1
+    elapsed = time.perf_counter() - start
+    failures += bad
+    print('%-26s %6d mismatches %9.2f ms/position' % ('search.minimax', bad, elapsed / len(positions) * 1e3))
+    return failures
+
+
+def check_geometries(count, seed):
+    # has_won and winning_cells against every window, on positions filled
+    # at random (wins and all) so there are plenty of lines and threats
+    rng = random.Random(seed)
+    failures = 0
+    for rows, cols, connect in GEOMETRIES:
+        g = get_geometry(rows, cols, connect)
+        versions = [('', g.has_won, g.winning_cells)]
+        if connect == 4:
+            versions.append((' general', lambda bits: Geometry.has_won(g, bits),
+                             lambda position, mask: Geometry.winning_cells(g, position, mask)))
+        bad = {name: 0 for name, _, _ in versions}
+        for _ in range(count):
+            bb = BitBoard(g)
+            for _ in range(rng.randint(0, g.cells)):
+                bb.play(rng.choice(bb.get_valid_locations()), rng.choice((PLAYER_PIECE, AI_PIECE)))
+            mask = bb.mask
+            empty = g.board_mask ^ mask
+            for piece in (PLAYER_PIECE, AI_PIECE):
+                position = bb.bits[piece]
+                won = any(position & w == w for w in g.window_masks)
+                # an empty cell completes a window when the rest of it is
+                # the piece's; gravity means only a column's top can be the
+                # gap of a vertical one
+                cells = 0
+                for w in g.window_masks:
+                    gap = w & ~position
+                    if gap & empty and gap & (gap - 1) == 0:
+                        cells |= gap
+                for name, has_won, winning_cells in versions:
+                    bad[name] += has_won(position) != won
+                    bad[name] += winning_cells(position, mask) != cells
+        for name, _, _ in versions:
+            failures += bad[name]
+            print('%-26s %6d mismatches' % ('geometry %dx%d/%d%s' % (rows, cols, connect, name), bad[name]))
+    return failures
+
+
+def check_solver(positions):
+    # one solver throughout, so weak searches also run on a table warmed
+    # by exact ones
+    solver = Solver()
+    bad = 0
+    start = time.perf_counter()
+    for moves in positions:
+        board = from_moves(moves)
+        piece = AI_PIECE if board.counter % 2 else PLAYER_PIECE
+        score = solver.solve(board, piece)
+        bad += solver.solve(board, piece, weak=True) != (score > 0) - (score < 0)
+        exact = solver.analyze(board, piece)
+        weak = solver.analyze(board, piece, weak=True)
+        bad += weak != [None if s is None else (s > 0) - (s < 0) for s in exact]
+    elapsed = time.perf_counter() - start
+    print('%-26s %6d mismatches %9.2f ms/position' % ('solver weak', bad, elapsed / len(positions) * 1e3))
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check evaluators and search against the golden positions')
+    parser.add_argument('--update', action='store_true', help='regenerate ' + GOLDEN_FILE)
+    parser.add_argument('--file', default=GOLDEN_FILE)
+    args = parser.parse_args()
+    if args.update:
+        write_golden(args.file, GOLDEN_COUNT, GOLDEN_SEED, GOLDEN_DEPTH)
+    positions = read_golden(args.file)
+    failures = check(positions, GOLDEN_DEPTH)
+    failures += check_geometries(GEOMETRY_POSITIONS, GOLDEN_SEED)
+    failures += check_solver([p[0] for p in positions if len(p[0]) >= SOLVER_MIN_MOVES] + SOLVER_POSITIONS)
+    if failures:
+        print('%d failures' % failures)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import pygame
+
+# Board drawing for the pygame front ends, redrawing only what changed.
+#
+# The blue grid with its empty holes never changes, so it is drawn once to
+# a Surface and blitted when the whole board is needed. After that only
+# the cell of a newly dropped piece and the strip above the board are
+# drawn, and each frame pushes just those rectangles to the display.
+#
+# Hover previews are only remembered when the mouse moves and drawn once
+# per frame in flush(), however many motion events came in.
+
+BLUE = (0,0,255)
+BLACK = (0,0,0)
+RED = (255,0,0)
+YELLOW = (255,255,0)
+
+
+class BoardRenderer():
+    def __init__(self, screen, rows, cols, square_size, radius):
+        self.screen = screen
+        self.rows = rows
+        self.cols = cols
+        self.square_size = square_size
+        self.radius = radius
+        self.width = cols * square_size
+        self.height = (rows + 1) * square_size
+        self.top = pygame.Rect(0, 0, self.width, square_size)
+
+        self.grid = pygame.Surface((self.width, rows * square_size))
+        self.grid.fill(BLUE)
+        for c in range(cols):
+            for r in range(rows):
+                pygame.draw.circle(self.grid, BLACK, (int(c*square_size+square_size/2), int(r*square_size+square_size/2)), radius)
+
+        self.dirty = []
+        # pending hover preview: None for nothing to do, else (x, colour) and
+        # a colour of None just clears the strip
+        self.hover = None
+
+    def cell_centre(self, row, col):
+        return (int(col * self.square_size + self.square_size / 2),
+                self.height - int(row * self.square_size + self.square_size / 2))
+
+    def draw_board(self, board, colours):
+        # everything, for the first frame: colours maps piece -> colour
+        self.screen.fill(BLACK, self.top)
+        self.screen.blit(self.grid, (0, self.square_size))
+        for c in range(self.cols):
+            for r in range(self.rows):
+                piece = int(board[r][c])
+                if piece in colours:
+                    pygame.draw.circle(self.screen, colours[piece], self.cell_centre(r, c), self.radius)
+        self.hover = None
+        self.dirty = [self.screen.get_rect()]
+
+    def draw_piece(self, row, col, colour):
+        rect = pygame.draw.circle(self.screen, colour, self.cell_centre(row, col), self.radius)
+        self.dirty.append(rect)
+
+    def clear_top(self):
+        self.hover = None
+        self.screen.fill(BLACK, self.top)
+        self.dirty.append(self.top)
+
+    def blit_top(self, surface, pos):
+        self.screen.blit(surface, pos)
+        self.dirty.append(self.top)
+
+    def set_hover(self, x, colour):
+        self.hover = (x, colour)
+
+    def flush(self):
+        # draw the latest hover preview and update the changed rectangles
+        if self.hover is not None:
+            x, colour = self.hover
+            self.clear_top()
+            if colour is not None:
+                pygame.draw.circle(self.screen, colour, (x, int(self.square_size/2)), self.radius)
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
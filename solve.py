@@ -0,0 +1,56 @@
+import argparse
+import sys
+
+from engine.bitboard import PLAYER_PIECE, AI_PIECE
+from engine.encoding import from_moves
+from engine.solver import Solver
+
+# Solves positions exactly and reports how long each one took.
+#
+#   python solve.py 3344 332211
+#   python solve.py < positions.txt
+#
+# A position is the columns played from an empty board (0-6), the first
+# word of each input line; the side to move is solved for. With --best the
+# exact score of every column is printed as well. A line that isn't a legal
+# game is reported and skipped.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve Connect 4 positions with perfect play')
+    parser.add_argument('positions', nargs='*', help='move sequences, read from stdin when none are given')
+    parser.add_argument('--weak', action='store_true', help='only find win, draw or loss')
+    parser.add_argument('--best', action='store_true', help='score every column too')
+    parser.add_argument('--table-size', type=int, default=1 << 21)
+    args = parser.parse_args()
+
+    lines = args.positions or (line.split()[0] for line in sys.stdin if line.strip())
+    solver = Solver(args.table_size)
+    total_nodes = 0
+    total_seconds = 0.0
+    for moves in lines:
+        try:
+            board = from_moves(moves)
+        except ValueError as e:
+            print('%s error: %s' % (moves, e))
+            continue
+        piece = AI_PIECE if board.counter % 2 else PLAYER_PIECE
+        if board.winning_move(PLAYER_PIECE + AI_PIECE - piece) or board.counter == board.geometry.cells:
+            print('%s game over' % moves)
+            continue
+        if args.best:
+            scores = solver.analyze(board, piece, args.weak)
+            result = ' '.join('.' if s is None else str(s) for s in scores)
+        else:
+            result = str(solver.solve(board, piece, args.weak))
+        stats = solver.stats()
+        total_nodes += stats['nodes']
+        total_seconds += stats['seconds']
+        print('%s %s  nodes %d  %.3f s  %.0f nodes/s' % (moves, result, stats['nodes'], stats['seconds'],
+                                                         stats['nodes_per_second']))
+    if total_seconds:
+        print('total: nodes %d  %.3f s  %.0f nodes/s' % (total_nodes, total_seconds, total_nodes / total_seconds))
+
+
+if __name__ == '__main__':
+    main()
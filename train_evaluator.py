@@ -0,0 +1,159 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import arena
+from engine.bitboard import BitBoard, PLAYER_PIECE, AI_PIECE
+from engine.gamelog import GameLog, GameLogWriter
+from engine.network import NetworkEvaluator, features, mirror_features, swap_features
+
+# Trains the network evaluator (see engine/network.py) from self-play.
+#
+#   python train_evaluator.py --games 20000 --out evaluator.npz
+#
+# If --log doesn't exist yet, --games self-play games between two
+# threats:--depth agents are played into it with arena.py, each starting
+# with a few random moves so the games differ. Every position in the log
+# that isn't the end of the game becomes a training example, labelled with
+# how the game ended from the AI's side: 1 for a win, -1 for a loss, 0 for
+# a draw. Each also goes in mirrored, and with the colours swapped and the
+# label negated: the arena always gives the first mover PLAYER_PIECE, so
+# without the swap the network would never see the AI move first, which
+# the game lets it do. The network learns to predict the label by
+# minibatch Adam on the squared error, and the weights with the lowest
+# error on the held-out games are saved to --out.
+
+SELF_PLAY_AGENT = 'threats'
+
+
+def play_games(path, games, depth, opening_plies, workers, seed):
+    agents = [(SELF_PLAY_AGENT, depth), (SELF_PLAY_AGENT, depth)]
+    with GameLogWriter(path) as log:
+        arena.run(agents, games, workers, seed, opening_plies, None, log)
+
+
+def examples(log, games):
+    # (features, labels) of every position before the end of the given games
+    geometry = log.geometry
+    xs = []
+    ys = []
+    for i in games:
+        moves, _, first, winner = log[i]
+        label = 0.0 if winner == 0 else (1.0 if winner == AI_PIECE else -1.0)
+        board = BitBoard(geometry)
+        piece = first
+        for col in moves:
+            xs.append(features(board.bits[AI_PIECE], board.bits[PLAYER_PIECE], piece == AI_PIECE, geometry))
+            ys.append(label)
+            board.play(col, piece)
+            piece = PLAYER_PIECE + AI_PIECE - piece
+    x = np.array(xs, dtype=np.uint8)
+    y = np.array(ys, dtype=np.float32)
+    # a position and its mirror image end the same way
+    x = np.concatenate([x, x[:, mirror_features(geometry)]])
+    y = np.concatenate([y, y])
+    # and with the colours swapped, the other way round
+    swapped = x[:, swap_features(geometry)]
+    swapped[:, -1] ^= 1
+    x = np.concatenate([x, swapped])
+    y = np.concatenate([y, -y])
+    return x, y
+
+
+class Adam():
+    def __init__(self, params, rate):
+        self.params = params
+        self.rate = rate
+        self.m = [np.zeros_like(p) for p in params]
+        self.v = [np.zeros_like(p) for p in params]
+        self.t = 0
+
+    def step(self, grads, beta1=0.9, beta2=0.999, eps=1e-8):
+        self.t += 1
+        rate = self.rate * np.sqrt(1 - beta2 ** self.t) / (1 - beta1 ** self.t)
+        for p, g, m, v in zip(self.params, grads, self.m, self.v):
+            m *= beta1
+            m += (1 - beta1) * g
+            v *= beta2
+            v += (1 - beta2) * g * g
+            p -= rate * m / (np.sqrt(v) + eps)
+
+
+def loss(params, x, y):
+    w1, b1, w2, b2 = params
+    out = np.tanh(np.maximum(x @ w1 + b1, 0) @ w2 + b2)
+    return float(np.mean((out - y) ** 2))
+
+
+def train(x, y, x_test, y_test, hidden, epochs, batch, rate, rng):
+    inputs = x.shape[1]
+    # He initialisation for the ReLU layer
+    w1 = (rng.standard_normal((inputs, hidden)) * np.sqrt(2 / inputs)).astype(np.float32)
+    b1 = np.zeros(hidden, dtype=np.float32)
+    w2 = (rng.standard_normal(hidden) * np.sqrt(1 / hidden)).astype(np.float32)
+    b2 = np.zeros(1, dtype=np.float32)
+    params = [w1, b1, w2, b2]
+    adam = Adam(params, rate)
+    x_test = x_test.astype(np.float32)
+    best = (loss(params, x_test, y_test), [p.copy() for p in params])
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        order = rng.permutation(len(x))
+        for i in range(0, len(x), batch):
+            xb = x[order[i:i + batch]].astype(np.float32)
+            yb = y[order[i:i + batch]]
+            pre = xb @ w1 + b1
+            h = np.maximum(pre, 0)
+            out = np.tanh(h @ w2 + b2)
+            # d(mean squared error)/d(output before tanh)
+            d_out = 2 * (out - yb) * (1 - out * out) / len(xb)
+            d_h = np.outer(d_out, w2) * (pre > 0)
+            adam.step([xb.T @ d_h, d_h.sum(axis=0), h.T @ d_out, np.array([d_out.sum()], dtype=np.float32)])
+        test = loss(params, x_test, y_test)
+        print('epoch %2d  train %.4f  test %.4f  %.1f s' %
+              (epoch + 1, loss(params, x[:len(x_test)].astype(np.float32), y[:len(x_test)]), test,
+               time.perf_counter() - start))
+        if test < best[0]:
+            best = (test, [p.copy() for p in params])
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the network evaluator from self-play games')
+    parser.add_argument('--log', default='selfplay.c4g', help='game log to train on, played first if missing')
+    parser.add_argument('--games', type=int, default=20000, help='self-play games to play into a new log')
+    parser.add_argument('--depth', type=int, default=2, help='search depth of the self-play agents')
+    parser.add_argument('--opening-plies', type=int, default=6, help='random moves at the start of every game')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--hidden', type=int, default=32, help='hidden units')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--rate', type=float, default=0.001, help='Adam learning rate')
+    parser.add_argument('--test', type=float, default=0.1, help='fraction of the games held out')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=arena.EVALUATOR_FILE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        start = time.perf_counter()
+        play_games(args.log, args.games, args.depth, args.opening_plies, args.workers, args.seed)
+        print('played %d games into %s in %.1f s' % (args.games, args.log, time.perf_counter() - start))
+    log = GameLog(args.log)
+    rng = np.random.default_rng(args.seed)
+    games = rng.permutation(len(log))
+    held_out = max(1, int(len(games) * args.test))
+    x, y = examples(log, games[held_out:])
+    x_test, y_test = examples(log, games[:held_out])
+    geometry = log.geometry
+    log.close()
+    print('%d training positions, %d held out' % (len(x), len(x_test)))
+
+    test, (w1, b1, w2, b2) = train(x, y, x_test, y_test, args.hidden, args.epochs, args.batch, args.rate, rng)
+    NetworkEvaluator(w1, b1, w2, b2, geometry).save(args.out)
+    print('saved %s, held-out error %.4f (always guessing 0: %.4f)' % (args.out, test, float(np.mean(y_test ** 2))))
+
+
+if __name__ == '__main__':
+    main()